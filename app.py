@@ -1,13 +1,23 @@
 import datetime
 import streamlit as st
 
+import engine
+import metrics
 import openai_picker
+import penalty_index
+import posters
 import recommender
+import records
 import storage
 import tmdb_client
+import traces
+import warmer
 
 st.set_page_config(page_title="3 Picks Tonight", page_icon="🎬", layout="centered")
 
+# Timing spans recorded during this rerun; shown under Diagnostics.
+waterfall = metrics.begin_request()
+
 TMDB_API_KEY = st.secrets.get("TMDB_API_KEY")
 OPENAI_API_KEY = st.secrets.get("OPENAI_API_KEY")
 
@@ -23,17 +33,46 @@ if not TMDB_API_KEY:
 if not OPENAI_API_KEY:
     st.warning("OpenAI key not found. Using heuristic picks instead of AI reasons.")
 
+
+@st.cache_resource
+def start_warmer():
+    # One background warmer per process, opt-in because it spends LLM calls.
+    return warmer.start_background(TMDB_API_KEY, OPENAI_API_KEY)
+
+
+if st.secrets.get("WARM_PICKS", False):
+    start_warmer()
+
+
+@st.cache_resource
+def start_metrics_server(port: int, host: str):
+    return metrics.serve(port, host)
+
+
+# METRICS_HOST = "0.0.0.0" opens the endpoint to scrapers on other machines.
+if st.secrets.get("METRICS_PORT"):
+    start_metrics_server(
+        int(st.secrets["METRICS_PORT"]), st.secrets.get("METRICS_HOST", "127.0.0.1")
+    )
+
+# Anonymized session traces for replay load tests (benchmarks/bench_load.py).
+RECORD_TRACES = bool(st.secrets.get("RECORD_TRACES", False))
+
 today_key = datetime.date.today().isoformat()
 
 # --- Session state defaults ---
 st.session_state.setdefault("refresh_count", {})           # {date: int}
-st.session_state.setdefault("seen_tmdb_ids", set())        # set[int]
-st.session_state.setdefault("current_picks", [])           # list[dict]
+st.session_state.setdefault("seen_tmdb_ids", records.SeenIds())  # capped, oldest dropped
+st.session_state.setdefault("current_picks", [])           # list[records.Movie]
 st.session_state.setdefault("current_reasons", {})         # {id: str}
 st.session_state.setdefault("highlight_id", None)          # int|None
 st.session_state.setdefault("picked_id", None)             # int|None
 st.session_state.setdefault("mood_text", "")               # str
 st.session_state.setdefault("candidate_count", 0)          # int
+st.session_state.setdefault("pending_llm", None)           # Future|None
+st.session_state.setdefault("pick_pool", None)             # {key, candidates}|None
+st.session_state.setdefault("last_waterfall", [])          # list[(stage, start_ms, ms)]
+st.session_state.setdefault("trace", traces.SessionTrace() if RECORD_TRACES else None)
 
 # Persist input values in session_state so they are always available on reruns
 st.session_state.setdefault("time_available", 120)
@@ -44,14 +83,7 @@ st.session_state.setdefault("tighten_runtime", False)
 
 def set_mood_text(label: str):
     # Convert chip label into a short natural mood sentence (better than just "Comfort")
-    mapping = {
-        "Comfort": "Something cozy and uplifting.",
-        "Laugh": "Something funny and easy.",
-        "Thrill": "Something exciting and tense.",
-        "Cry": "Something emotional and heartfelt.",
-        "Weird": "Something weird but good.",
-    }
-    st.session_state.mood_text = mapping.get(label, label)
+    st.session_state.mood_text = recommender.MOOD_CHIP_TEXT.get(label, label)
 
 
 # -----------------------------
@@ -103,78 +135,92 @@ with st.form("inputs"):
     submitted = st.form_submit_button("Get 3 picks")
 
 
+def current_inputs() -> dict:
+    # Read inputs from session_state (always available)
+    return {
+        "mood_text": st.session_state.mood_text,
+        "time_available": st.session_state.time_available,
+        "energy": st.session_state.energy,
+        "language": st.session_state.language,
+        "tighten_runtime": st.session_state.tighten_runtime,
+    }
+
+
 def compute_picks(force_refresh: bool = False) -> None:
+    if st.session_state.trace is not None:
+        st.session_state.trace.record("refresh" if force_refresh else "pick", current_inputs())
+    with metrics.span("compute_picks"):
+        _compute_picks(force_refresh)
+
+
+def _compute_picks(force_refresh: bool) -> None:
     refresh_count = st.session_state.refresh_count.get(today_key, 0)
     if force_refresh and refresh_count >= 3:
         st.info("Daily refresh limit reached. Try again tomorrow.")
         return
 
-    # Read inputs from session_state (always available)
-    mood_text = st.session_state.mood_text
-    time_available = st.session_state.time_available
-    energy = st.session_state.energy
-    language = st.session_state.language
-    tighten_runtime = st.session_state.tighten_runtime
-
+    inputs = current_inputs()
     try:
-        genre_map = tmdb_client.get_genre_map(TMDB_API_KEY, language)
-        params = recommender.build_discover_params(
-            mood_text=mood_text,
-            energy=energy,
-            time_available=time_available,
-            tighten_runtime=tighten_runtime,
-            genre_map=genre_map,
+        # Heuristic picks render immediately; the LLM picks upgrade them in
+        # place when they arrive (see apply_llm_upgrade).
+        result = engine.pick(
+            inputs,
+            TMDB_API_KEY,
+            OPENAI_API_KEY,
+            seen_ids=st.session_state.seen_tmdb_ids,
+            pool=st.session_state.pick_pool,
+            speculative=True,
         )
-        discover_pool = tmdb_client.discover_movies(TMDB_API_KEY, language, params)
     except RuntimeError:
         st.error("Could not reach TMDB. Please try again.")
         return
 
-    candidates = []
-    for movie in discover_pool:
-        if movie["id"] in st.session_state.seen_tmdb_ids:
-            continue
-        try:
-            details = tmdb_client.get_movie_details(TMDB_API_KEY, movie["id"], language)
-        except RuntimeError:
-            continue
-        if not details:
-            continue
-
-        candidates.append(details)
-        if len(candidates) >= 60:
-            break
-
-    feedback = storage.read_feedback()
-    user_state = {
-        "mood_text": mood_text,
-        "time_available": time_available,
-        "energy": energy,
-        "language": language,
-    }
-
-    st.session_state.candidate_count = len(candidates)
-    if len(candidates) < 3:
+    st.session_state.candidate_count = result["candidate_count"]
+    st.session_state.pick_pool = result["pool"]
+    picks = result["picks"]
+    if not picks:
         st.error("Not enough movies matched your filters. Try adjusting them.")
         return
 
-    picks, reasons, highlight_id = openai_picker.pick_movies(
-        candidates=candidates[:30],
-        user_state=user_state,
-        openai_api_key=OPENAI_API_KEY,
-        feedback=feedback,
-    )
-
     st.session_state.current_picks = picks
-    st.session_state.current_reasons = reasons
-    st.session_state.highlight_id = highlight_id
+    st.session_state.current_reasons = result["reasons"]
+    st.session_state.highlight_id = result["highlight_id"]
     st.session_state.picked_id = None
+    st.session_state.pending_llm = result["pending"]
     st.session_state.seen_tmdb_ids.update([m["id"] for m in picks])
 
     if force_refresh:
         st.session_state.refresh_count[today_key] = refresh_count + 1
 
 
+@st.fragment(run_every=0.5)
+def apply_llm_upgrade() -> None:
+    pending = st.session_state.pending_llm
+    if pending is None:
+        return
+    if not pending.done():
+        st.caption("✨ Refining picks…")
+        return
+
+    st.session_state.pending_llm = None
+    if st.session_state.picked_id is not None:
+        # The user already chose from the heuristic cards; don't swap them out.
+        return
+    try:
+        picks, reasons, highlight_id = pending.result()
+    except Exception:
+        return  # keep the heuristic picks
+
+    current_ids = [m["id"] for m in st.session_state.current_picks]
+    if {m["id"] for m in picks} != set(current_ids):
+        st.session_state.seen_tmdb_ids.difference_update(current_ids)
+        st.session_state.seen_tmdb_ids.update(m["id"] for m in picks)
+        st.session_state.current_picks = picks
+    st.session_state.current_reasons = reasons
+    st.session_state.highlight_id = highlight_id
+    st.rerun()
+
+
 if submitted:
     compute_picks(force_refresh=False)
 
@@ -201,7 +247,14 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-if st.session_state.current_picks:
+if st.session_state.pending_llm is not None:
+    apply_llm_upgrade()
+
+
+def render_picks() -> None:
+    if not st.session_state.current_picks:
+        return
+
     cols = st.columns(3)
     for col, movie in zip(cols, st.session_state.current_picks):
         with col:
@@ -209,17 +262,12 @@ if st.session_state.current_picks:
             class_name = "movie-card recommended" if recommended else "movie-card"
             st.markdown(f'<div class="{class_name}">', unsafe_allow_html=True)
 
-            poster_url = tmdb_client.get_poster_url(movie.get("poster_path"))
-            if poster_url:
-                st.image(poster_url, use_container_width=True)
-            else:
-                st.image(
-                    "https://via.placeholder.com/500x750?text=No+Poster",
-                    use_container_width=True,
-                )
+            # Everything below comes from the hydrated record; rendering makes
+            # no TMDB calls.
+            st.image(posters.poster_source(movie), use_container_width=True)
 
             title = movie["title"]
-            year = (movie.get("release_date") or "")[:4]
+            year = movie.get("year", "")
             st.subheader(f"{title} ({year})")
 
             runtime = movie.get("runtime") or "—"
@@ -231,7 +279,7 @@ if st.session_state.current_picks:
             reason = st.session_state.current_reasons.get(movie["id"], "A solid pick.")
             st.write(reason)
 
-            trailer_url = tmdb_client.get_trailer_url(TMDB_API_KEY, movie["id"], st.session_state.language)
+            trailer_url = movie.get("trailer_url")
             if trailer_url:
                 st.video(trailer_url)
             else:
@@ -259,7 +307,7 @@ if st.session_state.current_picks:
             )
 
             if st.button("Save feedback"):
-                storage.save_feedback(
+                entry = storage.save_feedback(
                     tmdb_id=picked_movie["id"],
                     mood_text=st.session_state.mood_text,
                     time_available=st.session_state.time_available,
@@ -267,14 +315,95 @@ if st.session_state.current_picks:
                     result=feedback_choice.lower(),
                     genre_ids=picked_movie.get("genre_ids", []),
                 )
+                penalty_index.record(entry)
+                if st.session_state.trace is not None:
+                    st.session_state.trace.record(
+                        "feedback",
+                        current_inputs(),
+                        position=st.session_state.current_picks.index(picked_movie),
+                        result=entry["result"],
+                    )
                 st.toast("Thanks for the feedback!")
 
 
+with metrics.span("render"):
+    render_picks()
+
+
+if any(stage == "compute_picks" for stage, _, _ in waterfall.spans):
+    st.session_state.last_waterfall = waterfall.spans
+metrics.end_request()
+metrics.export()
+
+
+def render_diagnostics() -> None:
+    st.write(f"TMDB key loaded: {bool(TMDB_API_KEY)}")
+    st.write(f"OpenAI key loaded: {bool(OPENAI_API_KEY)}")
+    st.write(f"Refresh count today: {st.session_state.refresh_count.get(today_key, 0)}")
+    st.write(f"Candidates fetched: {st.session_state.candidate_count}")
+    st.write(f"Seen ids count: {len(st.session_state.seen_tmdb_ids)}")
+
+    spans = st.session_state.last_waterfall
+    if spans:
+        st.caption("Last pick request (ms)")
+        total = max(start + duration for _, start, duration in spans) or 1
+        lines = []
+        for stage, start, duration in spans:
+            offset = int(24 * start / total)
+            width = max(1, int(24 * duration / total))
+            bar = " " * offset + "█" * width
+            lines.append(f"{stage:<18} {start:>7.1f} {duration:>7.1f} |{bar:<25}|")
+        st.code("\n".join(lines), language=None)
+
+    calls = metrics.counters("tmdb_calls_total")
+    misses = metrics.counters("tmdb_cache_misses_total")
+    sizes = tmdb_client.cache_stats()
+    if calls:
+        st.caption("TMDB cache (this process)")
+        st.table(
+            [
+                {
+                    "function": dict(labels)["function"],
+                    "calls": count,
+                    "hits": count - misses.get(labels, 0),
+                    "misses": misses.get(labels, 0),
+                    "entries": sizes[dict(labels)["function"]]["entries"],
+                    "KB": sizes[dict(labels)["function"]]["bytes"] // 1024,
+                }
+                for labels, count in sorted(calls.items())
+            ]
+        )
+    fallbacks = metrics.counters("llm_fallbacks_total")
+    if fallbacks:
+        st.write(
+            "LLM fallbacks: "
+            + ", ".join(f"{dict(labels)['reason']}={count}" for labels, count in fallbacks.items())
+        )
+
+    coalesced = metrics.counters("singleflight_coalesced_total")
+    if coalesced:
+        st.write(
+            "Coalesced calls: "
+            + ", ".join(f"{dict(labels)['group']}={count}" for labels, count in coalesced.items())
+        )
+
+    poster_hits = metrics.counters("poster_cache_total")
+    if poster_hits:
+        cache = posters.stats()
+        st.write(
+            f"Posters ({cache['variant']}): "
+            + ", ".join(
+                f"{dict(labels)['result']}={count}" for labels, count in poster_hits.items()
+            )
+            + f", {cache['files']} cached, {cache['bytes'] // 1024} KB"
+        )
+
+    st.json(tmdb_client.transport_stats(), expanded=False)
+    llm_requests = openai_picker.prompt_stats()
+    if llm_requests:
+        st.write(f"Last LLM prompt: {llm_requests[-1]}")
+
+
 with st.sidebar:
     with st.expander("Diagnostics"):
-        st.write(f"TMDB key loaded: {bool(TMDB_API_KEY)}")
-        st.write(f"OpenAI key loaded: {bool(OPENAI_API_KEY)}")
-        st.write(f"Refresh count today: {st.session_state.refresh_count.get(today_key, 0)}")
-        st.write(f"Candidates fetched: {st.session_state.candidate_count}")
-        st.write(f"Seen ids count: {len(st.session_state.seen_tmdb_ids)}")
-
+        render_diagnostics()
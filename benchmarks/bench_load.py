@@ -0,0 +1,357 @@
+"""Replays session traces at growing concurrency against the local stubs.
+
+    python benchmarks/bench_load.py                       # synthetic traces
+    python benchmarks/bench_load.py --traces data/traces.jsonl --sessions 10,50,200
+    python benchmarks/bench_load.py --speed 20 --llm-latency 1.5 --latency 0.08
+
+Traces come from the app with RECORD_TRACES = true in Streamlit secrets (see
+traces.py), or are generated here. Each concurrency level runs in a fresh
+process with its own stub server, caches and data directory, so memory and
+hit rates are per process. Every session is one thread that replays its
+trace the way app.py handles it: engine.pick with the session's seen ids and
+pool, the poster lookups of the render, the LLM upgrade, and
+storage.save_feedback + penalty_index.record for feedback. Sessions beyond
+the number of traces reuse them round-robin.
+
+--speed 0 (the default) drops the recorded think time between actions;
+--speed 10 replays it ten times faster than recorded.
+"""
+import argparse
+import json
+import os
+import pathlib
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from bench_suite import OPENAI_KEY, TMDB_KEY, percentile  # noqa: E402
+from stubs import StubConfig, StubServer  # noqa: E402
+
+REFRESH_LIMIT = 3
+FREE_TEXT_MOODS = [
+    "something funny and short after a long day",
+    "a slow burn mystery with a clever ending",
+    "big loud space adventure",
+    "a sad love story, I want to cry",
+    "cozy animated movie for the family",
+    "true crime but not too dark",
+    "weird arthouse horror",
+]
+
+
+def synthetic_traces(count, seed=7):
+    # Session shapes close to production: a first pick, some refreshes,
+    # feedback on a minority of sessions. Think time is 5-40 s per action.
+    import recommender
+
+    rng = random.Random(seed)
+    chips = list(recommender.MOOD_CHIP_TEXT.values())
+    sessions = []
+    for index in range(count):
+        session_id = f"synthetic-{index:05d}"
+        inputs = {
+            "mood_text": rng.choice(chips) if rng.random() < 0.7 else rng.choice(FREE_TEXT_MOODS),
+            "time_available": rng.choice([90, 105, 120, 120, 150, 180]),
+            "energy": rng.choice(["Dead", "Okay", "Okay", "Ready"]),
+            "language": "ko-KR" if rng.random() < 0.15 else "en-US",
+            "tighten_runtime": rng.random() < 0.2,
+        }
+        t = 0.0
+        events = [{"session": session_id, "t": t, "action": "pick", "inputs": inputs}]
+        for _ in range(rng.choice([0, 1, 1, 2, 3, 4])):
+            t += rng.uniform(5, 40)
+            events.append({"session": session_id, "t": round(t, 1), "action": "refresh",
+                           "inputs": inputs})
+        if rng.random() < 0.35:
+            t += rng.uniform(5, 40)
+            events.append({"session": session_id, "t": round(t, 1), "action": "feedback",
+                           "inputs": inputs, "position": rng.randrange(3),
+                           "result": rng.choice(["yes", "no"])})
+        sessions.append(events)
+    return sessions
+
+
+class Recorder:
+    # Latency samples from every session thread, keyed by stage.
+    def __init__(self):
+        self.samples = {}
+        self.limited = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def add_spans(self, spans):
+        with self._lock:
+            for stage, _, duration_ms in spans:
+                self.samples.setdefault(stage, []).append(duration_ms / 1000)
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+def replay_session(events, recorder, openai_key, speed):
+    import engine
+    import metrics
+    import penalty_index
+    import posters
+    import records
+    import storage
+
+    seen_ids = records.SeenIds()
+    pool = None
+    picks = []
+    inputs = engine.normalize_inputs({})
+    refreshes = 0
+    started = time.monotonic()
+    for event in events:
+        if speed > 0:
+            time.sleep(max(0.0, event["t"] / speed - (time.monotonic() - started)))
+        action = event["action"]
+        action_started = time.perf_counter()
+
+        if action in ("pick", "refresh"):
+            if action == "refresh" and refreshes >= REFRESH_LIMIT:
+                recorder.count("limited")
+                continue
+            inputs = engine.normalize_inputs(event.get("inputs") or {})
+            with metrics.request() as waterfall:
+                try:
+                    with metrics.span("compute_picks"):
+                        result = engine.pick(
+                            inputs, TMDB_KEY, openai_key,
+                            seen_ids=seen_ids, pool=pool, speculative=True,
+                        )
+                except RuntimeError:
+                    recorder.count("errors")
+                    continue
+                pool = result["pool"]
+                if result["picks"]:
+                    picks = result["picks"]
+                    seen_ids.update(movie["id"] for movie in picks)
+                    if action == "refresh":
+                        refreshes += 1
+                    with metrics.span("render"):
+                        for movie in picks:
+                            posters.poster_source(movie)
+                if result["pending"] is not None:
+                    # What apply_llm_upgrade waits for before swapping cards.
+                    with metrics.span("llm_upgrade"):
+                        try:
+                            upgraded, _, _ = result["pending"].result()
+                        except Exception:
+                            upgraded = None
+                    if upgraded and {m["id"] for m in upgraded} != {m["id"] for m in picks}:
+                        seen_ids.difference_update(m["id"] for m in picks)
+                        seen_ids.update(m["id"] for m in upgraded)
+                        picks = upgraded
+            recorder.add_spans(waterfall.spans)
+
+        elif action == "feedback" and picks:
+            movie = picks[min(event.get("position", 0), len(picks) - 1)]
+            # What the session's inputs were when it saved feedback; traces
+            # from before feedback carried inputs fall back to the last pick's.
+            if event.get("inputs"):
+                inputs = engine.normalize_inputs(event["inputs"])
+            with metrics.request() as waterfall:
+                with metrics.span("save_feedback"):
+                    entry = storage.save_feedback(
+                        tmdb_id=movie["id"],
+                        mood_text=inputs["mood_text"],
+                        time_available=inputs["time_available"],
+                        energy=inputs["energy"],
+                        result=event.get("result", "yes"),
+                        genre_ids=list(movie.get("genre_ids", [])),
+                    )
+                    penalty_index.record(entry)
+            recorder.add_spans(waterfall.spans)
+
+        recorder.add(f"action:{action}", time.perf_counter() - action_started)
+
+
+def rss_mib():
+    # Current resident set size; falls back to the peak where /proc is missing.
+    try:
+        pages = int(pathlib.Path("/proc/self/statm").read_text().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mib()
+
+
+def peak_rss_mib():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def hit_rates():
+    import metrics
+
+    rates = {}
+
+    def rate(name, hits, total):
+        if total:
+            rates[name] = round(100 * hits / total, 1)
+
+    calls = metrics.counters("tmdb_calls_total")
+    misses = metrics.counters("tmdb_cache_misses_total")
+    for labels, count in sorted(calls.items()):
+        rate(f"tmdb {dict(labels)['function']}", count - misses.get(labels, 0), count)
+    for family, name in (
+        ("llm_cache_total", "llm"),
+        ("pick_pool_total", "session pool"),
+        ("poster_cache_total", "posters"),
+    ):
+        counts = {dict(labels)["result"]: value for labels, value in
+                  metrics.counters(family).items()}
+        rate(name, counts.get("hit", 0), sum(counts.values()))
+    disk = {}
+    for labels, value in metrics.counters("disk_cache_total").items():
+        result = dict(labels)["result"]
+        disk[result] = disk.get(result, 0) + value
+    rate("disk cache", disk.get("hit", 0) + disk.get("stale", 0), sum(disk.values()))
+    for labels, value in metrics.counters("singleflight_coalesced_total").items():
+        rates[f"coalesced {dict(labels)['group']} (calls)"] = value
+    return rates
+
+
+def run_level(args):
+    # Child process: one concurrency level, printed as one JSON line.
+    workdir = tempfile.mkdtemp(prefix="picks-load-")
+    os.chdir(workdir)
+    config = StubConfig(latency=args.latency, jitter=args.jitter,
+                        llm_latency=args.llm_latency, seed=1)
+    with StubServer(config) as stub:
+        os.environ["TMDB_BASE_URL"] = f"{stub.url}/3"
+        os.environ["OPENAI_BASE_URL"] = f"{stub.url}/v1"
+        os.environ["TMDB_IMAGE_ROOT"] = f"{stub.url}/t/p"
+        import engine  # noqa: F401  (imports before the baseline measurement)
+        import penalty_index
+        import traces
+
+        penalty_index.rebuild()
+        sessions = traces.load(args.traces)
+        openai_key = None if args.no_llm else OPENAI_KEY
+        baseline = rss_mib()
+        recorder = Recorder()
+        threads = [
+            threading.Thread(
+                target=replay_session,
+                args=(sessions[index % len(sessions)], recorder, openai_key, args.speed),
+                daemon=True,
+            )
+            for index in range(args.child)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    actions = sum(len(v) for k, v in recorder.samples.items() if k.startswith("action:"))
+    print(json.dumps({
+        "sessions": args.child,
+        "actions": actions,
+        "seconds": elapsed,
+        "limited": recorder.limited,
+        "errors": recorder.errors,
+        "stages": {
+            stage: [len(samples)] + [percentile(samples, p) * 1000 for p in (50, 95, 99)]
+            for stage, samples in sorted(recorder.samples.items())
+        },
+        "hit_rates": hit_rates(),
+        "rss_mib": rss_mib(),
+        "baseline_mib": baseline,
+        "peak_mib": peak_rss_mib(),
+        "stub_requests": dict(sorted(stub.counts.items())),
+    }))
+
+
+def print_level(level):
+    sessions = level["sessions"]
+    print(f"\n== {sessions} sessions: {level['actions']} actions in {level['seconds']:.1f} s"
+          f" = {level['actions'] / level['seconds']:.1f} actions/s"
+          f" (refresh limit hit {level['limited']}, TMDB errors {level['errors']})")
+    print(f"{'stage':<22} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9}  ms")
+    for stage, (n, p50, p95, p99) in level["stages"].items():
+        print(f"{stage:<22} {n:>6} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f}")
+    print("hit rates: " + ", ".join(
+        f"{name} {value}%" if "coalesced" not in name else f"{name} {value:.0f}"
+        for name, value in level["hit_rates"].items()))
+    grown = level["rss_mib"] - level["baseline_mib"]
+    print(f"memory: RSS {level['rss_mib']:.1f} MiB (peak {level['peak_mib']:.1f}),"
+          f" +{grown:.1f} MiB over baseline = {1024 * grown / sessions:.0f} KiB/session")
+    print(f"stub requests: {level['stub_requests']}")
+
+
+def print_summary(levels):
+    print(f"\n{'sessions':>8} {'actions/s':>10} {'pick p95':>9} {'pick p99':>9}"
+          f" {'fb p99':>8} {'lock p99':>9} {'RSS MiB':>8}")
+    for level in levels:
+        stages = level["stages"]
+        pick = stages.get("action:pick", [0, 0, 0, 0])
+        feedback = stages.get("action:feedback", [0, 0, 0, 0])
+        lock = stages.get("feedback_lock_wait", [0, 0, 0, 0])
+        print(f"{level['sessions']:>8} {level['actions'] / level['seconds']:>10.1f}"
+              f" {pick[2]:>9.1f} {pick[3]:>9.1f} {feedback[3]:>8.1f} {lock[3]:>9.2f}"
+              f" {level['rss_mib']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--traces", help="trace JSONL file or directory (default: synthetic)")
+    parser.add_argument("--synthetic", type=int, default=200,
+                        help="number of synthetic sessions when --traces is not given")
+    parser.add_argument("--sessions", default="1,10,50,200",
+                        help="comma-separated concurrent session counts")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="think-time speedup; 0 replays back to back")
+    parser.add_argument("--latency", type=float, default=0.02, help="TMDB latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="OpenAI latency (s)")
+    parser.add_argument("--no-llm", action="store_true", help="heuristic picks only")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_level(args)
+
+    if not args.traces:
+        fd, path = tempfile.mkstemp(prefix="picks-traces-", suffix=".jsonl")
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            for events in synthetic_traces(args.synthetic):
+                for event in events:
+                    handle.write(json.dumps(event, ensure_ascii=False) + "\n")
+        args.traces = path
+    traces_path = str(pathlib.Path(args.traces).resolve())
+
+    levels = []
+    for sessions in (int(value) for value in args.sessions.split(",")):
+        command = [
+            sys.executable, __file__, "--child", str(sessions), "--traces", traces_path,
+            "--speed", str(args.speed), "--latency", str(args.latency),
+            "--jitter", str(args.jitter), "--llm-latency", str(args.llm_latency),
+        ]
+        if args.no_llm:
+            command.append("--no-llm")
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        level = json.loads(output.strip().splitlines()[-1])
+        print_level(level)
+        levels.append(level)
+    print_summary(levels)
+    print(f"\ntraces: {traces_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Per-session memory of hydrated movies and seen ids, before and after
+records.Movie / records.SeenIds.
+
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --sessions 500 --seen 400
+
+"dict" is the old layout: st.cache_data hands every session its own unpickled
+copy of each hydrated dict, and seen ids live in a set. "compact" is the
+current one: sessions share the cached Movie objects and keep ids in a capped
+uint32 array. Each session holds a 20-movie pool, three picks and `--seen`
+seen ids. Sizes come from tracemalloc.
+"""
+import argparse
+import pathlib
+import pickle
+import sys
+import tracemalloc
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import records  # noqa: E402
+import stubs  # noqa: E402
+
+POOL_SIZE = 20
+
+
+def legacy_record(movie):
+    # The dict get_movie_details used to return.
+    return {
+        "id": movie["id"],
+        "title": movie["title"],
+        "release_date": movie["release_date"],
+        "year": movie["release_date"][:4],
+        "runtime": movie["runtime"],
+        "overview": movie["overview"],
+        "poster_path": movie["poster_path"],
+        "poster_url": f"https://image.tmdb.org/t/p/w500{movie['poster_path']}",
+        "trailer_url": f"https://www.youtube.com/watch?v={movie['videos']['results'][0]['key']}",
+        "genres": [genre["name"] for genre in movie["genres"]],
+        "genre_ids": [genre["id"] for genre in movie["genres"]],
+        "vote_average": movie["vote_average"],
+        "vote_count": movie["vote_count"],
+        "popularity": movie["popularity"],
+    }
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return size, kept
+
+
+def dict_sessions(movies, sessions, seen):
+    cached = pickle.dumps([legacy_record(movie) for movie in movies])
+
+    def build():
+        states = []
+        for session in range(sessions):
+            pool = pickle.loads(cached)  # one st.cache_data hit per session
+            ids = {(session * 7919 + n) % 900_000 for n in range(seen)}
+            states.append({"pool": pool, "picks": pool[:3], "seen": ids})
+        return states
+
+    return build
+
+
+def compact_sessions(movies, sessions, seen):
+    shared = [records.Movie.from_dict(legacy_record(movie)) for movie in movies]
+
+    def build():
+        states = []
+        for session in range(sessions):
+            pool = list(shared)
+            ids = records.SeenIds(
+                ((session * 7919 + n) % 900_000 for n in range(seen)), limit=max(seen, 1)
+            )
+            states.append({"pool": pool, "picks": pool[:3], "seen": ids})
+        return states
+
+    return build
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--seen", type=int, default=records.MAX_SEEN_IDS)
+    args = parser.parse_args()
+
+    movies = stubs.make_movies(POOL_SIZE)
+    record_dict, _ = measure(lambda: [legacy_record(movie) for movie in movies])
+    record_compact, _ = measure(
+        lambda: [records.Movie.from_dict(legacy_record(movie)) for movie in movies]
+    )
+    print(f"{'per record':<12} dict {record_dict / POOL_SIZE:>8.0f} B"
+          f"   compact {record_compact / POOL_SIZE:>8.0f} B")
+
+    dict_total, _ = measure(dict_sessions(movies, args.sessions, args.seen))
+    compact_total, _ = measure(compact_sessions(movies, args.sessions, args.seen))
+    print(f"{'per session':<12} dict {dict_total / args.sessions:>8.0f} B"
+          f"   compact {compact_total / args.sessions:>8.0f} B"
+          f"   ({dict_total / max(compact_total, 1):.1f}x smaller)")
+    print(f"{args.sessions} sessions: dict {dict_total / 2**20:.1f} MiB,"
+          f" compact {compact_total / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Measure the token cost of the compact LLM prompt against the old payload.
+
+    python benchmarks/bench_prompt.py
+    OPENAI_API_KEY=... python benchmarks/bench_prompt.py --live --rounds 5
+
+Offline, this reports estimated input tokens and cost per request for the old
+pretty-JSON payload (30 candidates, 240-char overviews) and for the compact
+table at several budgets. With --live it also sends both prompts to the model
+and reports latency, billed input tokens and how often the two prompts agree on
+the three picks.
+"""
+import argparse
+import json
+import os
+import pathlib
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import openai_picker  # noqa: E402
+import recommender  # noqa: E402
+
+# gpt-4.1-mini list price, USD per million input tokens.
+INPUT_PRICE_PER_MTOK = 0.40
+BUDGETS = [600, 900, 1200, 1800]
+USER_STATE = {
+    "mood_text": "Something cozy and uplifting.",
+    "time_available": 120,
+    "energy": "Okay",
+    "language": "en-US",
+}
+WORDS = (
+    "a quiet town finds its voice when an unlikely friendship grows between two strangers"
+).split()
+
+
+def make_candidates(count=30, seed=11):
+    rng = random.Random(seed)
+    genres = ["Comedy", "Drama", "Family", "Romance", "Thriller", "Mystery"]
+    return [
+        {
+            "id": 1000 + index,
+            "title": f"Movie {index}",
+            "release_date": f"{rng.randint(1990, 2024)}-01-01",
+            "runtime": rng.randint(80, 160),
+            "genres": rng.sample(genres, 2),
+            "genre_ids": [],
+            "overview": " ".join(rng.choice(WORDS) for _ in range(60)),
+            "popularity": rng.uniform(5, 300),
+            "vote_average": round(rng.uniform(5, 8.5), 3),
+            "vote_count": rng.randint(200, 20000),
+        }
+        for index in range(count)
+    ]
+
+
+def legacy_user_message(candidates):
+    # The payload _call_openai used to send.
+    return json.dumps(
+        {
+            "user_state": USER_STATE,
+            "candidates": [
+                {
+                    "tmdb_id": movie["id"],
+                    "title": movie["title"],
+                    "year": (movie.get("release_date") or "")[:4],
+                    "runtime": movie.get("runtime"),
+                    "genres": movie.get("genres", []),
+                    "overview": (movie.get("overview") or "")[:240],
+                    "popularity": movie.get("popularity", 0),
+                    "vote_average": movie.get("vote_average", 0),
+                    "vote_count": movie.get("vote_count", 0),
+                }
+                for movie in candidates
+            ],
+        },
+        ensure_ascii=False,
+    )
+
+
+def compact_user_message(candidates, budget):
+    top = recommender.score_candidates(candidates, USER_STATE)[: openai_picker.PROMPT_TOP_K]
+    return top, openai_picker.build_user_message(top, USER_STATE, token_budget=budget)
+
+
+def report_offline(candidates):
+    legacy = openai_picker.estimate_tokens(
+        openai_picker.SYSTEM_MESSAGE + legacy_user_message(candidates)
+    )
+    print(f"{'prompt':>16} {'tokens':>8} {'saved':>7} {'$ / 1k req':>11}")
+    print(f"{'legacy (30)':>16} {legacy:>8} {'':>7} {legacy * INPUT_PRICE_PER_MTOK / 1000:>11.4f}")
+    for budget in BUDGETS:
+        _, message = compact_user_message(candidates, budget)
+        tokens = openai_picker.estimate_tokens(openai_picker.SYSTEM_MESSAGE + message)
+        label = f"compact @{budget}"
+        print(
+            f"{label:>16} {tokens:>8} {1 - tokens / legacy:>6.0%} "
+            f"{tokens * INPUT_PRICE_PER_MTOK / 1000:>11.4f}"
+        )
+
+
+def report_live(candidates, rounds):
+    from openai import OpenAI
+
+    client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+    top, compact = compact_user_message(candidates, openai_picker.PROMPT_TOKEN_BUDGET)
+    prompts = {
+        "legacy": (candidates, legacy_user_message(candidates)),
+        "compact": (top, compact),
+    }
+    results = {name: {"latency": [], "tokens": [], "picks": []} for name in prompts}
+    for _ in range(rounds):
+        for name, (pool, message) in prompts.items():
+            started = time.perf_counter()
+            response = client.responses.create(
+                model=openai_picker.MODEL_NAME,
+                input=[
+                    {"role": "system", "content": openai_picker.SYSTEM_MESSAGE},
+                    {"role": "user", "content": message},
+                ],
+                text={"format": {"type": "json_object"}},
+            )
+            results[name]["latency"].append(time.perf_counter() - started)
+            results[name]["tokens"].append(response.usage.input_tokens)
+            try:
+                selected, _ = openai_picker._validate_response(response.output_text, pool)
+            except ValueError:
+                selected = []
+            results[name]["picks"].append(set(selected))
+
+    for name, data in results.items():
+        print(
+            f"{name:>8}: p50 {statistics.median(data['latency']) * 1000:.0f} ms, "
+            f"input tokens {statistics.mean(data['tokens']):.0f}, "
+            f"valid {sum(bool(p) for p in data['picks'])}/{rounds}"
+        )
+    overlaps = [
+        len(a & b) / 3
+        for a, b in zip(results["legacy"]["picks"], results["compact"]["picks"])
+        if a and b
+    ]
+    if overlaps:
+        print(f"pick overlap legacy vs compact: {statistics.mean(overlaps):.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--live", action="store_true")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    candidates = make_candidates()
+    report_offline(candidates)
+    if args.live:
+        report_live(candidates, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Cold-start profile of a new app process: imports, first render, first pick.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --with-llm-key
+    python benchmarks/bench_startup.py --no-snapshot    # genre maps over the network
+
+Every run is a fresh Python process in an empty working directory, so no
+module, in-process cache or disk cache survives between runs. "imports"
+times each module app.py imports, in app order, and lists the heaviest
+packages from `python -X importtime`. "first render" runs app.py once
+through Streamlit's AppTest against the local stubs, then submits the
+first pick, which is what a replica behind an autoscaler answers first.
+Reported times are medians over --runs.
+"""
+import argparse
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from bench_suite import OPENAI_KEY, TMDB_KEY  # noqa: E402
+from stubs import StubConfig, StubServer  # noqa: E402
+
+# The imports at the top of app.py, in order.
+APP_MODULES = [
+    "streamlit", "engine", "metrics", "openai_picker", "penalty_index", "posters",
+    "recommender", "records", "storage", "tmdb_client", "traces", "warmer",
+]
+HEAVIEST = 10
+
+
+def child_imports():
+    timings = {}
+    for name in APP_MODULES:
+        started = time.perf_counter()
+        __import__(name)
+        timings[name] = time.perf_counter() - started
+    return {"imports": timings, "openai_loaded": "openai" in sys.modules}
+
+
+def child_render(args):
+    os.chdir(tempfile.mkdtemp(prefix="picks-startup-"))
+    config = StubConfig(latency=args.latency, llm_latency=args.llm_latency, seed=1)
+    with StubServer(config) as stub:
+        os.environ["TMDB_BASE_URL"] = f"{stub.url}/3"
+        os.environ["OPENAI_BASE_URL"] = f"{stub.url}/v1"
+        os.environ["TMDB_IMAGE_ROOT"] = f"{stub.url}/t/p"
+        started = time.perf_counter()
+        from streamlit.testing.v1 import AppTest
+
+        if args.no_snapshot:
+            import tmdb_client
+
+            tmdb_client.GENRE_SNAPSHOT_FILE = pathlib.Path(os.devnull)
+
+        at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=60)
+        at.secrets["TMDB_API_KEY"] = TMDB_KEY
+        if args.with_llm_key:
+            at.secrets["OPENAI_API_KEY"] = OPENAI_KEY
+        at.run()
+        first_render = time.perf_counter() - started
+        openai_loaded = "openai" in sys.modules
+
+        at.button[0].click().run()
+        started = time.perf_counter()
+        at.button(key="FormSubmitter:inputs-Get 3 picks").click().run()
+        first_pick = time.perf_counter() - started
+        spans = {stage: ms for stage, _, ms in at.session_state.last_waterfall}
+        errors = [element.value for element in at.error]
+        return {
+            "first_render": first_render,
+            "first_pick": first_pick,
+            "genre_map_ms": spans.get("genre_map"),
+            "openai_loaded_at_render": openai_loaded,
+            "errors": errors,
+            "stub_requests": dict(sorted(stub.counts.items())),
+        }
+
+
+def heaviest_packages():
+    # Packages by cumulative import time, from -X importtime. A package
+    # imported by another one (urllib3 under requests) is listed on its own
+    # too, so the rows overlap.
+    code = "import " + ", ".join(APP_MODULES)
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        root = name.strip().split(".")[0]
+        if (ROOT / f"{root}.py").exists() or root in ("site", "encodings"):
+            continue
+        packages[root] = max(packages.get(root, 0), int(cumulative) / 1e6)
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:HEAVIEST]
+
+
+def run_child(mode, args):
+    command = [sys.executable, __file__, "--child", mode,
+               "--latency", str(args.latency), "--llm-latency", str(args.llm_latency)]
+    if args.with_llm_key:
+        command.append("--with-llm-key")
+    if args.no_snapshot:
+        command.append("--no-snapshot")
+    output = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.08, help="TMDB latency (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="OpenAI latency (s)")
+    parser.add_argument("--with-llm-key", action="store_true",
+                        help="set OPENAI_API_KEY, so the first pick imports the SDK")
+    parser.add_argument("--no-snapshot", action="store_true",
+                        help="ignore the shipped genre map snapshot")
+    parser.add_argument("--child", choices=["imports", "render"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = child_imports() if args.child == "imports" else child_render(args)
+        print(json.dumps(result))
+        return
+
+    imports = [run_child("imports", args) for _ in range(args.runs)]
+    print(f"{'import (app order)':<22} {'median ms':>10}")
+    total = 0.0
+    for name in APP_MODULES:
+        ms = statistics.median(run["imports"][name] for run in imports) * 1000
+        total += ms
+        print(f"{name:<22} {ms:>10.1f}")
+    print(f"{'total':<22} {total:>10.1f}")
+    print(f"openai imported at startup: {any(run['openai_loaded'] for run in imports)}")
+
+    print(f"\n{'heaviest packages':<22} {'cumul. ms':>10}")
+    for name, seconds in heaviest_packages():
+        print(f"{name:<22} {seconds * 1000:>10.1f}")
+
+    renders = [run_child("render", args) for _ in range(args.runs)]
+    print(f"\n{'cold process':<22} {'median ms':>10}")
+    for key in ("first_render", "first_pick"):
+        ms = statistics.median(run[key] for run in renders) * 1000
+        print(f"{key.replace('_', ' '):<22} {ms:>10.1f}")
+    genre_ms = [r["genre_map_ms"] for r in renders if r["genre_map_ms"] is not None]
+    if genre_ms:
+        print(f"{'genre_map span':<22} {statistics.median(genre_ms):>10.1f}")
+    print(f"openai imported by first render: {renders[-1]['openai_loaded_at_render']}")
+    print(f"stub requests (last run): {renders[-1]['stub_requests']}")
+    errors = [error for r in renders for error in r["errors"]]
+    if errors:
+        print(f"app errors: {errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Offline benchmark suite for the pick hot path.
+
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --latency 0.08 --jitter 0.04 \
+        --throttle-rate 0.02 --error-rate 0.01 --llm-latency 1.5
+    python benchmarks/bench_suite.py --slow-rate 0.05 --budget 3
+
+Everything runs against benchmarks/stubs.py on localhost, inside a temporary
+working directory, so no API keys or network access are needed. Reports
+p50/p95/p99 for the micro-benchmarks and for the end-to-end compute_picks
+pipeline with cold and warm caches.
+"""
+import argparse
+import math
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from stubs import StubConfig, StubServer  # noqa: E402
+
+TMDB_KEY = "stub-tmdb-key"
+OPENAI_KEY = "stub-openai-key"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def report(name, samples, unit="ms"):
+    scale = 1000 if unit == "ms" else 1_000_000
+    p50, p95, p99 = (percentile(samples, p) * scale for p in (50, 95, 99))
+    print(f"{name:<34} {p50:>10.3f} {p95:>10.3f} {p99:>10.3f}  {unit}  (n={len(samples)})")
+
+
+def run(func, iterations, setup=None):
+    samples = []
+    for index in range(iterations):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func(index)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def micro_benchmarks(iterations):
+    import openai_picker
+    import recommender
+    import storage
+    import stubs
+
+    genre_map = {
+        "name_to_id": {name: gid for gid, name in stubs.GENRES},
+        "id_to_name": dict(stubs.GENRES),
+    }
+    movies = stubs.make_movies(30)
+    candidates = [
+        {
+            "id": m["id"],
+            "title": m["title"],
+            "runtime": m["runtime"],
+            "genres": [g["name"] for g in m["genres"]],
+            "genre_ids": [g["id"] for g in m["genres"]],
+            "popularity": m["popularity"],
+            "vote_average": m["vote_average"],
+            "vote_count": m["vote_count"],
+        }
+        for m in movies
+    ]
+    user_state = {"mood_text": "Something funny and easy.", "time_available": 120,
+                  "energy": "Okay", "language": "en-US"}
+    feedback = [
+        {"result": "no", "energy": "Okay", "mood_text": "funny night", "genre_ids": [35, 18]}
+    ] * 20
+    raw = stubs.stub_llm_answer(
+        "\n".join(f"{m['id']}|x" for m in candidates[:3])
+    )
+    moods = list(recommender.MOOD_CHIP_TEXT.values())
+
+    print(f"{'micro-benchmark':<34} {'p50':>10} {'p95':>10} {'p99':>10}")
+    report("build_discover_params", run(
+        lambda i: recommender.build_discover_params(moods[i % 5], "Dead", 120, False, genre_map),
+        iterations), unit="us")
+    report("score_candidates (30)", run(
+        lambda i: recommender.score_candidates(candidates, user_state, feedback), iterations),
+        unit="us")
+    report("pick_top_three (30)", run(
+        lambda i: recommender.pick_top_three(candidates, user_state, feedback), iterations),
+        unit="us")
+    report("_validate_response", run(
+        lambda i: openai_picker._validate_response(raw, candidates), iterations), unit="us")
+    report("storage.save_feedback", run(
+        lambda i: storage.save_feedback(i, moods[i % 5], 120, "Okay", "no", [35]), iterations),
+        unit="us")
+    report("storage.read_feedback(limit=20)", run(
+        lambda i: storage.read_feedback(limit=20), iterations), unit="us")
+    report("storage.read_feedback() full", run(
+        lambda i: storage.read_feedback(), iterations), unit="us")
+
+
+def end_to_end(iterations, use_llm, budget=None):
+    import disk_cache
+    import engine
+    import openai_picker
+    import recommender
+    import tmdb_client
+
+    moods = list(recommender.MOOD_CHIP_TEXT.values())
+
+    def compute_picks(index):
+        inputs = {
+            "mood_text": moods[index % len(moods)],
+            "time_available": 120,
+            "energy": "Okay",
+            "language": "en-US",
+            "tighten_runtime": False,
+        }
+        try:
+            engine.pick(inputs, TMDB_KEY, OPENAI_KEY if use_llm else None, budget=budget)
+        except RuntimeError:
+            return
+
+    def clear_caches():
+        for cached in (
+            tmdb_client.get_genre_map,
+            tmdb_client.discover_movies_live,
+            tmdb_client.get_movie_details,
+        ):
+            cached.clear()
+        disk_cache.clear()
+        openai_picker.clear_cache()
+
+    print(f"\n{'end-to-end compute_picks':<34} {'p50':>10} {'p95':>10} {'p99':>10}")
+    report("cold caches", run(compute_picks, iterations, setup=clear_caches))
+    # First pass fills every cache layer; the second is measured.
+    run(compute_picks, len(moods))
+    report("warm caches", run(compute_picks, iterations))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--micro-iterations", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.02, help="TMDB latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="OpenAI latency (s)")
+    parser.add_argument("--slow-rate", type=float, default=0.0,
+                        help="fraction of TMDB responses that stall")
+    parser.add_argument("--slow-latency", type=float, default=3.0, help="stall length (s)")
+    parser.add_argument("--no-llm", action="store_true", help="heuristic picks only")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="per-request deadline (s), as in the app")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="picks-bench-")
+    os.chdir(workdir)
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        llm_latency=args.llm_latency,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        seed=1,
+    )
+    with StubServer(config) as stub:
+        os.environ["TMDB_BASE_URL"] = f"{stub.url}/3"
+        os.environ["OPENAI_BASE_URL"] = f"{stub.url}/v1"
+        os.environ["TMDB_IMAGE_ROOT"] = f"{stub.url}/t/p"
+        micro_benchmarks(args.micro_iterations)
+        end_to_end(args.iterations, use_llm=not args.no_llm, budget=args.budget)
+        print(f"\nstub requests: {dict(sorted(stub.counts.items()))}")
+        import metrics
+
+        hedged = metrics.counter_value("tmdb_hedged_requests_total")
+        dropped = metrics.counter_value("tmdb_deadline_dropped_total")
+        print(f"hedged detail requests: {hedged}, dropped at deadline: {dropped}")
+    print(f"scratch directory: {workdir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""Local stand-ins for the TMDB and OpenAI endpoints the app calls.
+
+StubServer serves, on one local port:
+
+    GET  /3/genre/movie/list
+    GET  /3/discover/movie           (page, with_genres, without_genres,
+                                      with_runtime.lte)
+    GET  /3/movie/<id>               (append_to_response=videos)
+    GET  /t/p/<size>/<file>.jpg      (poster bytes)
+    POST /v1/responses               (OpenAI Responses API, JSON mode)
+
+Point the app at it with TMDB_BASE_URL=<url>/3 and OPENAI_BASE_URL=<url>/v1.
+Latency, tail stalls, error rate and 429 injection are configurable per
+server.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+GENRES = [
+    (28, "Action"), (12, "Adventure"), (16, "Animation"), (35, "Comedy"),
+    (80, "Crime"), (99, "Documentary"), (18, "Drama"), (10751, "Family"),
+    (14, "Fantasy"), (36, "History"), (27, "Horror"), (10402, "Music"),
+    (9648, "Mystery"), (10749, "Romance"), (878, "Science Fiction"),
+    (53, "Thriller"), (10752, "War"), (37, "Western"),
+]
+PAGE_SIZE = 20
+
+
+def make_movies(count=2000, seed=5):
+    rng = random.Random(seed)
+    movies = []
+    for movie_id in range(1, count + 1):
+        genres = rng.sample(GENRES, rng.randint(1, 3))
+        movies.append(
+            {
+                "id": movie_id,
+                "title": f"Stub Movie {movie_id}",
+                "release_date": f"{rng.randint(1980, 2024)}-{rng.randint(1, 12):02d}-01",
+                "runtime": rng.randint(75, 190),
+                "overview": "A stub overview for load testing. " * rng.randint(2, 6),
+                "poster_path": f"/poster{movie_id}.jpg",
+                "genres": [{"id": gid, "name": name} for gid, name in genres],
+                "vote_average": round(rng.uniform(4.5, 8.8), 3),
+                "vote_count": rng.randint(150, 30000),
+                "popularity": round(rng.uniform(1, 400), 3),
+                "videos": {
+                    "results": [
+                        {"site": "YouTube", "type": "Trailer", "name": "Official Trailer",
+                         "key": f"stub{movie_id}"}
+                    ]
+                },
+            }
+        )
+    movies.sort(key=lambda m: m["popularity"], reverse=True)
+    return movies
+
+
+class StubConfig:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                 retry_after=1, llm_latency=0.0, slow_rate=0.0, slow_latency=3.0, seed=None):
+        self.latency = latency          # seconds added to every TMDB response
+        self.jitter = jitter            # uniform +/- seconds on top of latency
+        self.slow_rate = slow_rate      # fraction of TMDB responses that stall...
+        self.slow_latency = slow_latency  # ...for this many extra seconds
+        self.error_rate = error_rate    # fraction answered with 500
+        self.throttle_rate = throttle_rate  # fraction answered with 429
+        self.retry_after = retry_after  # Retry-After seconds sent with 429
+        self.llm_latency = llm_latency  # seconds added to every /v1/responses
+        self.rng = random.Random(seed)
+
+
+class StubServer:
+    def __init__(self, config=None, movies=None, host="127.0.0.1", port=0):
+        self.config = config or StubConfig()
+        self.movies = movies if movies is not None else make_movies()
+        self.by_id = {movie["id"]: movie for movie in self.movies}
+        self.counts = {}
+        self._lock = threading.Lock()
+        handler = type("Handler", (_Handler,), {"stub": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def discover(self, query):
+        results = self.movies
+        with_genres = query.get("with_genres")
+        if with_genres:
+            wanted = {int(g) for g in re.split(r"[,|]", with_genres) if g}
+            any_of = "|" in with_genres
+            results = [
+                m for m in results
+                if (wanted & _genre_ids(m) if any_of else wanted <= _genre_ids(m))
+            ]
+        without_genres = query.get("without_genres")
+        if without_genres:
+            excluded = {int(g) for g in re.split(r"[,|]", without_genres) if g}
+            results = [m for m in results if not excluded & _genre_ids(m)]
+        if "with_runtime.lte" in query:
+            limit = int(query["with_runtime.lte"])
+            results = [m for m in results if m["runtime"] <= limit]
+        min_votes = int(query.get("vote_count.gte", 0))
+        results = [m for m in results if m["vote_count"] >= min_votes]
+
+        page = int(query.get("page", 1))
+        chunk = results[(page - 1) * PAGE_SIZE: page * PAGE_SIZE]
+        return {
+            "page": page,
+            "total_results": len(results),
+            "total_pages": (len(results) + PAGE_SIZE - 1) // PAGE_SIZE,
+            "results": [
+                {
+                    "id": m["id"],
+                    "title": m["title"],
+                    "genre_ids": sorted(_genre_ids(m)),
+                    "popularity": m["popularity"],
+                    "vote_average": m["vote_average"],
+                    "vote_count": m["vote_count"],
+                    "poster_path": m["poster_path"],
+                    "release_date": m["release_date"],
+                }
+                for m in chunk
+            ],
+        }
+
+
+def _genre_ids(movie):
+    return {genre["id"] for genre in movie["genres"]}
+
+
+def response_payload(text, input_tokens=0):
+    return {
+        "id": "resp_stub",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": "stub",
+        "status": "completed",
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+        "output": [
+            {
+                "type": "message",
+                "id": "msg_stub",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": 60,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + 60,
+        },
+    }
+
+
+def stub_llm_answer(user_message):
+    # Pick the first three candidate rows of the compact table.
+    ids = []
+    for line in user_message.splitlines():
+        head = line.split("|", 1)[0]
+        if head.isdigit():
+            ids.append(int(head))
+        if len(ids) == 3:
+            break
+    return json.dumps(
+        {"selected_ids": ids, "reasons": {str(i): "A stub pick that fits tonight." for i in ids}}
+    )
+
+
+_poster = None
+
+
+def poster_bytes():
+    # A real 500x750 JPEG, like TMDB's w500 variant, so the poster cache has
+    # something to decode and shrink.
+    global _poster
+    if _poster is None:
+        import io
+
+        from PIL import Image
+
+        out = io.BytesIO()
+        Image.new("RGB", (500, 750), (90, 60, 120)).save(out, "JPEG", quality=90)
+        _poster = out.getvalue()
+    return _poster
+
+
+class _Handler(BaseHTTPRequestHandler):
+    stub = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        path = parsed.path
+
+        if path.startswith("/t/p/"):
+            self.stub.count("poster")
+            return self._send(200, poster_bytes(), "image/jpeg")
+        if self._inject_failure():
+            return
+
+        if path == "/3/genre/movie/list":
+            self.stub.count("genres")
+            return self._json(200, {"genres": [{"id": i, "name": n} for i, n in GENRES]})
+        if path == "/3/discover/movie":
+            self.stub.count("discover")
+            return self._json(200, self.stub.discover(query))
+
+        match = re.fullmatch(r"/3/movie/(\d+)", path)
+        if match:
+            movie = self.stub.by_id.get(int(match.group(1)))
+            if movie is None:
+                return self._json(404, {"status_message": "not found"})
+            self.stub.count("details")
+            payload = {k: v for k, v in movie.items() if k != "videos"}
+            if "videos" in query.get("append_to_response", ""):
+                payload["videos"] = movie["videos"]
+            return self._json(200, payload)
+
+        self._json(404, {"status_message": "unknown path"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if urlparse(self.path).path != "/v1/responses":
+            return self._json(404, {"error": {"message": "unknown path"}})
+        self.stub.count("responses")
+        config = self.stub.config
+        if config.llm_latency:
+            time.sleep(config.llm_latency)
+        user_message = next(
+            (m["content"] for m in body.get("input", []) if m.get("role") == "user"), ""
+        )
+        self._json(200, response_payload(stub_llm_answer(user_message), len(user_message) // 4))
+
+    def _inject_failure(self):
+        config = self.stub.config
+        delay = config.latency + config.rng.uniform(-config.jitter, config.jitter)
+        if config.rng.random() < config.slow_rate:
+            delay += config.slow_latency
+        if delay > 0:
+            time.sleep(delay)
+        roll = config.rng.random()
+        if roll < config.throttle_rate:
+            self.stub.count("throttled")
+            self._json(429, {"status_message": "rate limited"},
+                       headers={"Retry-After": str(config.retry_after)})
+            return True
+        if roll < config.throttle_rate + config.error_rate:
+            self.stub.count("errors")
+            self._json(500, {"status_message": "stub error"})
+            return True
+        return False
+
+    def _json(self, status, payload, headers=None):
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
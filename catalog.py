@@ -0,0 +1,182 @@
+import argparse
+import bisect
+import json
+import os
+import pathlib
+import threading
+import time
+
+import mood_index
+import records
+
+
+CATALOG_PATH = pathlib.Path(os.environ.get("TMDB_CATALOG_PATH", "data/catalog"))
+PAGE_SIZE = 100
+MIN_VOTE_COUNT = 200
+
+_catalogs = {}
+_lock = threading.Lock()
+
+
+class Catalog:
+    def __init__(self, movies):
+        # Rows are kept in popularity order, so ascending bit order in every
+        # bitmap is already the discover sort order (popularity.desc).
+        self.movies = sorted(movies, key=lambda m: m.get("popularity", 0), reverse=True)
+        self.all_rows = (1 << len(self.movies)) - 1
+
+        self.genre_bitmaps = {}
+        for row, movie in enumerate(self.movies):
+            for genre_id in movie.get("genre_ids", []):
+                self.genre_bitmaps[genre_id] = self.genre_bitmaps.get(genre_id, 0) | (1 << row)
+
+        # Sorted runtimes plus prefix bitmaps: runtime <= x is one bisect and
+        # one lookup.
+        by_runtime = sorted(
+            range(len(self.movies)), key=lambda row: self.movies[row].get("runtime") or 0
+        )
+        self.runtimes = [self.movies[row].get("runtime") or 0 for row in by_runtime]
+        self.runtime_prefix = [0]
+        for row in by_runtime:
+            self.runtime_prefix.append(self.runtime_prefix[-1] | (1 << row))
+
+    def query(self, params):
+        mask = self.all_rows
+
+        with_genres = params.get("with_genres")
+        if with_genres:
+            mask &= self._genre_mask(str(with_genres))
+
+        without_genres = params.get("without_genres")
+        if without_genres:
+            for genre_id in _split_ids(str(without_genres).replace("|", ",")):
+                mask &= ~self.genre_bitmaps.get(genre_id, 0)
+
+        runtime_lte = params.get("with_runtime.lte")
+        if runtime_lte is not None:
+            mask &= self.runtime_prefix[bisect.bisect_right(self.runtimes, runtime_lte)]
+
+        page = int(params.get("page", 1))
+        skip = (page - 1) * PAGE_SIZE
+        results = []
+        while mask and len(results) < PAGE_SIZE:
+            lowest = mask & -mask
+            mask ^= lowest
+            if skip:
+                skip -= 1
+                continue
+            results.append(self.movies[lowest.bit_length() - 1])
+        return results
+
+    def _genre_mask(self, value):
+        # TMDB semantics: "," means AND, "|" means OR.
+        if "|" in value:
+            mask = 0
+            for genre_id in _split_ids(value.replace("|", ",")):
+                mask |= self.genre_bitmaps.get(genre_id, 0)
+            return mask
+        mask = self.all_rows
+        for genre_id in _split_ids(value):
+            mask &= self.genre_bitmaps.get(genre_id, 0)
+        return mask
+
+
+def _split_ids(value):
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def query(language, params):
+    # Returns None when there is no usable local catalog for this language,
+    # or when nothing in it matches, so the caller can fall back to live
+    # TMDB. Catalog pages hold PAGE_SIZE movies and do not line up with
+    # TMDB's 20-result pages, so running out past page 1 ends the listing
+    # ([]) instead of continuing on live page N.
+    catalog = load(language)
+    if catalog is None:
+        return None
+    results = catalog.query(params)
+    if results or int(params.get("page", 1)) > 1:
+        return results
+    return None
+
+
+def load(language):
+    path = _catalog_file(language)
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    with _lock:
+        cached = _catalogs.get(language)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+    catalog = Catalog([records.Movie.from_dict(movie) for movie in data.get("movies", [])])
+    with _lock:
+        _catalogs[language] = (mtime, catalog)
+    return catalog
+
+
+def ingest(api_key, language, pages=100):
+    import tmdb_client
+
+    movie_ids = []
+    for page in range(1, pages + 1):
+        try:
+            results = tmdb_client.discover_movies_live(api_key, language, {"page": page})
+        except RuntimeError:
+            break
+        if not results:
+            break
+        movie_ids.extend(movie["id"] for movie in results)
+
+    movies = [
+        details
+        for details in tmdb_client.get_movie_details_many(
+            api_key, movie_ids, language, hedge=False
+        )
+        if details.get("vote_count", 0) >= MIN_VOTE_COUNT
+    ]
+    _write(language, movies)
+    mood_index.build(language, movies)
+    return len(movies)
+
+
+def _write(language, movies):
+    path = _catalog_file(language)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(
+        json.dumps(
+            {"built_at": time.time(), "movies": [movie.to_dict() for movie in movies]},
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    os.replace(tmp, path)
+
+
+def _catalog_file(language):
+    return CATALOG_PATH / f"{language}.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local TMDB movie catalog.")
+    parser.add_argument("command", choices=["ingest"])
+    parser.add_argument("--language", action="append", default=None)
+    parser.add_argument("--pages", type=int, default=100)
+    args = parser.parse_args()
+
+    api_key = os.environ.get("TMDB_API_KEY")
+    if not api_key:
+        parser.error("TMDB_API_KEY must be set")
+    for language in args.language or ["en-US", "ko-KR"]:
+        count = ingest(api_key, language, pages=args.pages)
+        print(f"{language}: {count} movies")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import time
+
+
+class Deadline:
+    # Absolute time budget for one pick request, passed down so every network
+    # call can size its timeout to what is left.
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap):
+        # Never hand requests a zero timeout; requests treats that as an error
+        # at connect time rather than "give up now".
+        return max(0.05, min(cap, self.remaining()))
+
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+
+import metrics
+
+
+CACHE_FILE = pathlib.Path(os.environ.get("TMDB_CACHE_PATH", "data/tmdb_cache.sqlite3"))
+
+# Seconds an entry is fresh, per endpoint. Expired entries are still served for
+# up to MAX_STALE seconds while a background refresh replaces them.
+TTLS = {
+    "genres": 7 * 24 * 3600,
+    "discover": 6 * 3600,
+    "details": 7 * 24 * 3600,
+    "warm": 2 * 3600,
+}
+DEFAULT_TTL = 3600
+MAX_STALE = 30 * 24 * 3600
+MAX_BYTES = 64 * 1024 * 1024
+EVICT_EVERY = 50
+# Reads only bump the LRU clock when it is older than this, to avoid a write
+# on every hit.
+TOUCH_INTERVAL = 60
+
+_local = threading.local()
+_lock = threading.Lock()
+_refreshing = set()
+_puts_since_evict = 0
+
+
+def cached(namespace, key_parts, loader, fallback=None, refresh_loader=None):
+    # With a fallback (a snapshot shipped with the app), a cold miss answers
+    # from it at once and loads the live value in the background, as for a
+    # stale entry. Background loads use refresh_loader when given, so they
+    # are not held to the limits of the request that triggered them.
+    refresh_loader = refresh_loader or loader
+    key = make_key(namespace, key_parts)
+    entry = _read(key)
+    if entry is not None:
+        value, stored_at = entry
+        age = time.time() - stored_at
+        if age <= TTLS.get(namespace, DEFAULT_TTL):
+            metrics.incr("disk_cache_total", namespace=namespace, result="hit")
+            return value
+        if age <= MAX_STALE:
+            metrics.incr("disk_cache_total", namespace=namespace, result="stale")
+            _refresh_in_background(namespace, key, refresh_loader)
+            return value
+
+    if fallback is not None:
+        metrics.incr("disk_cache_total", namespace=namespace, result="fallback")
+        _refresh_in_background(namespace, key, refresh_loader)
+        return fallback
+
+    metrics.incr("disk_cache_total", namespace=namespace, result="miss")
+    value = loader()
+    _write(namespace, key, value)
+    return value
+
+
+def lookup(namespace, key_parts, max_age=None):
+    # Plain read for values written with store(); None when missing or older
+    # than max_age (defaults to the namespace TTL).
+    entry = _read(make_key(namespace, key_parts))
+    if entry is None:
+        return None
+    value, stored_at = entry
+    if max_age is None:
+        max_age = TTLS.get(namespace, DEFAULT_TTL)
+    if time.time() - stored_at > max_age:
+        return None
+    return value
+
+
+def store(namespace, key_parts, value):
+    _write(namespace, make_key(namespace, key_parts), value)
+
+
+def make_key(namespace, key_parts):
+    raw = json.dumps([namespace, key_parts], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def clear(namespace=None):
+    conn = _connect()
+    with conn:
+        if namespace is None:
+            conn.execute("DELETE FROM entries")
+        else:
+            conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+
+
+def stats():
+    conn = _connect()
+    rows = conn.execute(
+        "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY namespace"
+    ).fetchall()
+    return {namespace: {"entries": count, "bytes": size} for namespace, count, size in rows}
+
+
+def _refresh_in_background(namespace, key, loader):
+    with _lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def refresh():
+        try:
+            _write(namespace, key, loader())
+        except Exception:
+            # keep serving the stale copy; the next read will retry
+            pass
+        finally:
+            with _lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+def _read(key):
+    conn = _connect()
+    row = conn.execute(
+        "SELECT value, stored_at, accessed_at FROM entries WHERE key = ?", (key,)
+    ).fetchone()
+    if row is None:
+        return None
+    value, stored_at, accessed_at = row
+    now = time.time()
+    if now - accessed_at > TOUCH_INTERVAL:
+        with conn:
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+    return json.loads(value), stored_at
+
+
+def _write(namespace, key, value):
+    global _puts_since_evict
+    payload = json.dumps(value, ensure_ascii=False)
+    now = time.time()
+    conn = _connect()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, namespace, value, size, stored_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, namespace, payload, len(payload), now, now),
+        )
+    with _lock:
+        _puts_since_evict += 1
+        due = _puts_since_evict >= EVICT_EVERY
+        if due:
+            _puts_since_evict = 0
+    if due:
+        _evict(conn)
+
+
+def _evict(conn):
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    if total <= MAX_BYTES:
+        return
+    # Trim to 90% of the cap so we don't evict again on the very next put.
+    excess = total - int(MAX_BYTES * 0.9)
+    doomed = []
+    for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+        doomed.append((key,))
+        excess -= size
+        if excess <= 0:
+            break
+    with conn:
+        conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+
+def _connect():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        return conn
+    CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(CACHE_FILE, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS entries ("
+        "key TEXT PRIMARY KEY, namespace TEXT NOT NULL, value TEXT NOT NULL, "
+        "size INTEGER NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+    conn.commit()
+    _local.conn = conn
+    return conn
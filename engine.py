@@ -0,0 +1,295 @@
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import deadline
+import metrics
+import openai_picker
+import penalty_index
+import pipeline
+import posters
+import recommender
+import warmer
+
+
+# Wall-clock budget for one interactive pick request, TMDB and LLM included.
+REQUEST_BUDGET_SECONDS = 8.0
+# Batch requests that share discover params share one pool of this size, so
+# each state still has enough left after its own seen ids are removed.
+BATCH_POOL_TARGET = 60
+BATCH_WORKERS = 8
+
+
+def normalize_inputs(state):
+    # Raises ValueError, with a message fit for an HTTP 400, when the state
+    # is not a JSON object of the expected field types.
+    if not isinstance(state, dict):
+        raise ValueError("each state must be an object")
+    for field in ("mood_text", "energy", "language"):
+        if state.get(field) is not None and not isinstance(state[field], str):
+            raise ValueError(f"{field} must be a string")
+    time_available = state.get("time_available") or 120
+    if (
+        isinstance(time_available, bool)
+        or not isinstance(time_available, (int, float))
+        or not math.isfinite(time_available)
+    ):
+        raise ValueError("time_available must be a number of minutes")
+    seen_ids = state.get("seen_ids") or []
+    if not isinstance(seen_ids, list) or not all(
+        isinstance(movie_id, int) and not isinstance(movie_id, bool) for movie_id in seen_ids
+    ):
+        raise ValueError("seen_ids must be a list of integers")
+    return {
+        "mood_text": state.get("mood_text") or "",
+        "time_available": int(time_available),
+        "energy": state.get("energy") or "Okay",
+        "language": state.get("language") or "en-US",
+        "tighten_runtime": bool(state.get("tighten_runtime", False)),
+    }
+
+
+def parse_states(body):
+    # The states of a POST /picks body, {"states": [...]}; ValueError when
+    # the body has another shape.
+    payload = json.loads(body or b"{}")
+    if not isinstance(payload, dict) or not isinstance(payload.get("states"), list):
+        raise ValueError('expected {"states": [...]}')
+    for state in payload["states"]:
+        normalize_inputs(state)
+    return payload["states"]
+
+
+def pick(
+    inputs,
+    tmdb_api_key,
+    openai_api_key,
+    seen_ids=(),
+    pool=None,
+    budget=REQUEST_BUDGET_SECONDS,
+    speculative=False,
+):
+    # One pick request, without Streamlit. Returns a dict with picks, reasons,
+    # highlight_id, candidate_count, pool (the candidate pool to keep for the
+    # next request with the same inputs) and pending (a Future for the LLM
+    # upgrade when speculative, else None). picks is empty when fewer than
+    # three movies matched. Raises RuntimeError when TMDB cannot be reached.
+    user_state = pipeline.user_state_from(inputs)
+    request_deadline = deadline.Deadline(budget) if budget else None
+    with metrics.span("feedback_penalties"):
+        penalties = penalty_index.get_penalties(user_state)
+
+    # Same inputs as the last live request: page through the unseen part of
+    # its pool locally. Chip moods are usually precomputed by the warmer.
+    with metrics.span("pool_lookup"):
+        local = pipeline.pick_from_pool(pool, inputs, seen_ids, penalties)
+    if local is None:
+        with metrics.span("warm_lookup"):
+            local = warmer.lookup_picks(inputs, seen_ids, penalties)
+    if local is not None:
+        picks, reasons, highlight_id, candidate_count = local
+        return _result(picks, reasons, highlight_id, candidate_count, pool)
+
+    candidates = pipeline.gather_candidates(
+        tmdb_api_key, inputs, exclude_ids=seen_ids, deadline=request_deadline
+    )
+    pool = {"key": pipeline.pool_key(inputs), "candidates": candidates}
+    result = _pick_live(
+        candidates, user_state, openai_api_key, penalties, request_deadline, pool, speculative
+    )
+    _prefetch_posters(result["picks"], candidates, user_state, penalties)
+    return result
+
+
+def _prefetch_posters(picks, candidates, user_state, penalties):
+    # The picks about to render, then the best-ranked rest of the pool, which
+    # is what the next refreshes page through (see pipeline.pick_from_pool).
+    if not picks:
+        return
+    shown = {movie["id"] for movie in picks}
+    rest = [movie for movie in candidates if movie["id"] not in shown]
+    ranked = recommender.score_candidates(rest, user_state, penalties=penalties)
+    posters.prefetch(list(picks) + ranked[: posters.PREFETCH_COUNT - len(picks)])
+
+
+def _pick_live(
+    candidates, user_state, openai_api_key, penalties, request_deadline, pool, speculative
+):
+    if len(candidates) < 3:
+        return _result([], {}, None, len(candidates), pool)
+    with metrics.span("pick"):
+        if speculative:
+            # Heuristic picks now; the LLM picks arrive through `pending`.
+            picks, reasons, highlight_id, pending = openai_picker.pick_movies_speculative(
+                candidates,
+                user_state,
+                openai_api_key,
+                penalties=penalties,
+                deadline=request_deadline,
+            )
+        else:
+            picks, reasons, highlight_id = openai_picker.pick_movies(
+                candidates,
+                user_state,
+                openai_api_key,
+                penalties=penalties,
+                deadline=request_deadline,
+            )
+            pending = None
+    return _result(picks, reasons, highlight_id, len(candidates), pool, pending)
+
+
+def _result(picks, reasons, highlight_id, candidate_count, pool, pending=None):
+    return {
+        "picks": picks,
+        "reasons": reasons,
+        "highlight_id": highlight_id,
+        "candidate_count": candidate_count,
+        "pool": pool,
+        "pending": pending,
+    }
+
+
+def pick_batch(states, tmdb_api_key, openai_api_key, workers=BATCH_WORKERS):
+    # Picks for many user states in one pass. States whose discover params
+    # match share one discover + hydration run; scoring and LLM calls then
+    # fan out over a worker pool. Each state may carry its own "seen_ids".
+    # Returns one result per state, in order; a state that failed has an
+    # "error" instead of picks.
+    inputs_list = [normalize_inputs(state) for state in states]
+    results = [None] * len(states)
+
+    groups = {}  # (language, params json) -> [state index, ...]
+    params_by_group = {}
+    for index, inputs in enumerate(inputs_list):
+        try:
+            params = pipeline.discover_params(tmdb_api_key, inputs)
+        except RuntimeError as exc:
+            results[index] = {"error": str(exc)}
+            continue
+        group = (inputs["language"], json.dumps(params, sort_keys=True))
+        groups.setdefault(group, []).append(index)
+        params_by_group[group] = params
+
+    def gather(group):
+        language, _ = group
+        return pipeline.hydrate_candidates(
+            tmdb_api_key, language, params_by_group[group], target=BATCH_POOL_TARGET, hedge=False
+        )
+
+    def pick_one(index, candidates):
+        inputs = inputs_list[index]
+        seen_ids = set(states[index].get("seen_ids") or ())
+        unseen = [movie for movie in candidates if movie["id"] not in seen_ids]
+        user_state = pipeline.user_state_from(inputs)
+        penalties = penalty_index.get_penalties(user_state)
+        result = _pick_live(unseen, user_state, openai_api_key, penalties, None, None, False)
+        return index, result
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pick-batch") as executor:
+        pools = {group: executor.submit(gather, group) for group in groups}
+        pending = []
+        for group, future in pools.items():
+            try:
+                candidates = future.result()
+            except RuntimeError as exc:
+                for index in groups[group]:
+                    results[index] = {"error": str(exc)}
+                continue
+            metrics.incr("batch_shared_discover_total", len(groups[group]) - 1)
+            pending.extend(
+                executor.submit(pick_one, index, candidates) for index in groups[group]
+            )
+        for future in pending:
+            index, result = future.result()
+            results[index] = result
+    return results
+
+
+def to_json(result):
+    if "error" in result:
+        return {"error": result["error"]}
+    return {
+        "picks": [movie.to_dict() for movie in result["picks"]],
+        "reasons": {str(movie_id): reason for movie_id, reason in result["reasons"].items()},
+        "highlight_id": result["highlight_id"],
+        "candidate_count": result["candidate_count"],
+    }
+
+
+def serve(tmdb_api_key, openai_api_key, port, host="127.0.0.1", workers=BATCH_WORKERS):
+    # POST /picks with {"states": [...]}; answers {"results": [...]}.
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/picks":
+                return self._send(404, {"error": "unknown path"})
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                states = parse_states(self.rfile.read(length))
+            except ValueError as exc:
+                return self._send(400, {"error": str(exc)})
+            results = pick_batch(states, tmdb_api_key, openai_api_key, workers)
+            self._send(200, {"results": [to_json(result) for result in results]})
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute picks without the Streamlit app.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    batch = sub.add_parser("batch", help="read user states as JSON lines, write results")
+    batch.add_argument("input", nargs="?", default="-", help="JSONL file, or - for stdin")
+    http = sub.add_parser("serve", help="answer POST /picks on a local port")
+    http.add_argument("--port", type=int, default=8502)
+    http.add_argument("--host", default="127.0.0.1")
+    for command in (batch, http):
+        command.add_argument("--workers", type=int, default=BATCH_WORKERS)
+        command.add_argument("--no-llm", action="store_true", help="heuristic picks only")
+    args = parser.parse_args()
+
+    tmdb_api_key = os.environ.get("TMDB_API_KEY")
+    if not tmdb_api_key:
+        parser.error("TMDB_API_KEY must be set")
+    openai_api_key = None if args.no_llm else os.environ.get("OPENAI_API_KEY")
+
+    if args.command == "serve":
+        server = serve(tmdb_api_key, openai_api_key, args.port, args.host, args.workers)
+        print(f"serving on http://{args.host}:{server.server_address[1]}/picks")
+        server.serve_forever()
+        return
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    states = []
+    with source:
+        for number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                state = json.loads(line)
+                normalize_inputs(state)
+            except ValueError as exc:
+                parser.error(f"line {number}: {exc}")
+            states.append(state)
+    for result in pick_batch(states, tmdb_api_key, openai_api_key, args.workers):
+        print(json.dumps(to_json(result), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import bisect
+import contextlib
+import os
+import pathlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+EXPORT_FILE = pathlib.Path(os.environ.get("METRICS_FILE", "data/metrics.prom"))
+EXPORT_INTERVAL = 10
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> float
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+_local = threading.local()
+_last_export = 0.0
+
+
+class Waterfall:
+    # Spans recorded on the request thread, as (name, start_ms, duration_ms).
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def add(self, name, started, duration):
+        self.spans.append(
+            (name, round((started - self.started) * 1000, 1), round(duration * 1000, 1))
+        )
+
+    def total_ms(self):
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+
+def begin_request():
+    # Spans recorded on this thread from now on land in the returned waterfall.
+    waterfall = Waterfall()
+    _local.waterfall = waterfall
+    return waterfall
+
+
+def end_request():
+    _local.waterfall = None
+
+
+@contextlib.contextmanager
+def request():
+    waterfall = begin_request()
+    try:
+        yield waterfall
+    finally:
+        end_request()
+
+
+@contextlib.contextmanager
+def span(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        observe("stage_seconds", duration, stage=stage)
+        waterfall = getattr(_local, "waterfall", None)
+        if waterfall is not None:
+            waterfall.add(stage, started, duration)
+
+
+def incr(name, amount=1, **labels):
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    key = (name, _label_key(labels))
+    with _lock:
+        buckets = _histograms.get(key)
+        if buckets is None:
+            buckets = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        buckets[bisect.bisect_left(BUCKETS, value)] += 1
+        buckets[-1] += value
+
+
+def counter_value(name, **labels):
+    with _lock:
+        return _counters.get((name, _label_key(labels)), 0)
+
+
+def counters(name):
+    # {labels dict as tuple: value} for one counter family.
+    with _lock:
+        return {labels: value for (n, labels), value in _counters.items() if n == name}
+
+
+def render_prometheus():
+    with _lock:
+        counter_items = sorted(_counters.items())
+        histogram_items = sorted((key, list(value)) for key, value in _histograms.items())
+
+    lines = []
+    seen = set()
+    for (name, labels), value in counter_items:
+        if name not in seen:
+            lines.append(f"# TYPE {name} counter")
+            seen.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), buckets in histogram_items:
+        if name not in seen:
+            lines.append(f"# TYPE {name} histogram")
+            seen.add(name)
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ["+Inf"], buckets[:-1]):
+            cumulative += count
+            bucket_labels = labels + (("le", str(bound)),)
+            lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {buckets[-1]:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def export(path=None, force=False):
+    # Rewrites the text-format snapshot at most every EXPORT_INTERVAL seconds.
+    global _last_export
+    now = time.monotonic()
+    with _lock:
+        if not force and now - _last_export < EXPORT_INTERVAL:
+            return
+        _last_export = now
+    path = pathlib.Path(path or EXPORT_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(render_prometheus(), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def serve(port, host="127.0.0.1"):
+    # Prometheus-style scrape endpoint on its own thread; GET /metrics. Local
+    # only unless a host is given, like engine.serve.
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200 if self.path == "/metrics" else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{value}"' for key, value in labels)
+    return "{" + inner + "}"
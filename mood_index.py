@@ -0,0 +1,331 @@
+import argparse
+import math
+import os
+import pathlib
+import re
+import threading
+import zlib
+
+import numpy as np
+
+
+INDEX_PATH = pathlib.Path(os.environ.get("MOOD_INDEX_PATH", "data/mood_index"))
+# Hashed feature space; collisions are rare at this size for short texts.
+DIMENSIONS = 1 << 15
+# Free-text moods pick a discover genre only above this cosine similarity.
+GENRE_MIN_SIMILARITY = 0.12
+# Candidates missing from the index are vectorised per request, in one batch
+# of at most this many (request pools are 20, warmer and batch pools 60).
+# Larger un-indexed pools get no mood affinity: tokenising costs ~70 us per
+# movie, which would swamp columnar scoring.
+LOOSE_VECTORIZE_LIMIT = 100
+
+# Words that describe how a genre feels rather than what happens in it. They
+# are folded into every movie of the genre, so "something funny" reaches
+# comedies whose overviews never say "funny". Keyed by TMDB genre id, which is
+# the same in every language.
+GENRE_LEXICON = {
+    28: "action exciting explosive fight chase adrenaline fast intense epic",
+    12: "adventure journey quest epic explore exciting escape world",
+    16: "animation animated cartoon family colorful whimsical cute",
+    35: "comedy funny hilarious laugh light easy silly witty fun",
+    80: "crime gritty heist gangster detective dark tense",
+    99: "documentary real true events learn interesting facts",
+    18: "drama emotional heartfelt moving serious cry character",
+    10751: "family cozy wholesome kids heartwarming gentle comfort",
+    14: "fantasy magic magical whimsical imaginative dreamy otherworldly",
+    36: "history historical period past true events",
+    27: "horror scary creepy dread terrifying spooky",
+    10402: "music musical songs concert upbeat",
+    9648: "mystery puzzle twist weird strange clever mind",
+    10749: "romance romantic love date sweet heartfelt",
+    878: "science fiction scifi space future weird mind bending strange",
+    53: "thriller tense suspense exciting gripping edge twist",
+    10752: "war battle soldiers intense historical",
+    37: "western cowboy frontier dusty slow",
+}
+
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have i in into is it its me my of on or "
+    "our so some something that the their them they this to tonight want was we what "
+    "when which while who will with would you your".split()
+)
+
+_indexes = {}  # language -> (mtime, MoodIndex)
+_lexicon = None  # (genre_ids, vectors) used when no index has been built
+_lock = threading.Lock()
+
+
+def tokenize(text):
+    tokens = []
+    for word in re.findall(r"\w+", (text or "").lower()):
+        if word in STOP_WORDS or word.isdigit():
+            continue
+        tokens.append(_stem(word))
+    return tokens
+
+
+def _stem(word):
+    # Just enough folding that "thrilling", "thriller" and "thrills" meet.
+    for suffix in ("ing", "ers", "er", "ed", "es", "s", "ly"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[: -len(suffix)]
+    return word
+
+
+def _bucket(token):
+    return zlib.crc32(token.encode("utf-8")) % DIMENSIONS
+
+
+def _hashed_counts(tokens):
+    counts = {}
+    for token in tokens:
+        bucket = _bucket(token)
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
+
+
+def movie_text(movie):
+    genre_words = " ".join(
+        GENRE_LEXICON.get(genre_id, "") for genre_id in movie.get("genre_ids", [])
+    )
+    genres = " ".join(movie.get("genres", []))
+    return f"{movie.get('title', '')} {genres} {genre_words} {movie.get('overview', '')}"
+
+
+class MoodIndex:
+    # TF-IDF over hashed tokens. Movie vectors are stored as CSR rows (offsets,
+    # indices, weights) and are L2-normalised, so a dot product is the cosine.
+    def __init__(self, df, ids, offsets, indices, weights, genre_ids, genre_vectors):
+        self.df = df
+        self.idf = np.log((1 + len(ids)) / (1 + df)) + 1
+        self.rows = {int(movie_id): row for row, movie_id in enumerate(ids)}
+        self.offsets = offsets
+        self.indices = indices
+        self.weights = weights
+        self.row_of = np.repeat(np.arange(len(ids)), np.diff(offsets))
+        self.genre_ids = [int(genre_id) for genre_id in genre_ids]
+        self.genre_vectors = genre_vectors
+
+    @classmethod
+    def build(cls, movies):
+        documents = [_hashed_counts(tokenize(movie_text(movie))) for movie in movies]
+        df = np.zeros(DIMENSIONS, dtype=np.float64)
+        for counts in documents:
+            df[list(counts)] += 1
+        idf = np.log((1 + len(documents)) / (1 + df)) + 1
+
+        ids = np.array([movie["id"] for movie in movies], dtype=np.int64)
+        offsets = [0]
+        indices = []
+        weights = []
+        for counts in documents:
+            row_indices, row_weights = _weigh(counts, idf)
+            indices.extend(row_indices)
+            weights.extend(row_weights)
+            offsets.append(len(indices))
+        offsets = np.array(offsets, dtype=np.int64)
+        indices = np.array(indices, dtype=np.int32)
+        weights = np.array(weights, dtype=np.float32)
+
+        # Genre centroid = lexicon plus every movie of that genre, normalised.
+        genre_ids = sorted(GENRE_LEXICON)
+        genre_vectors = np.zeros((len(genre_ids), DIMENSIONS), dtype=np.float32)
+        for position, genre_id in enumerate(genre_ids):
+            lexicon_indices, lexicon_weights = _weigh(
+                _hashed_counts(tokenize(GENRE_LEXICON[genre_id])), idf
+            )
+            genre_vectors[position, lexicon_indices] += lexicon_weights
+        genre_rows = {genre_id: position for position, genre_id in enumerate(genre_ids)}
+        for row, movie in enumerate(movies):
+            start, end = offsets[row], offsets[row + 1]
+            for genre_id in movie.get("genre_ids", []):
+                if genre_id in genre_rows:
+                    genre_vectors[genre_rows[genre_id], indices[start:end]] += weights[start:end]
+        norms = np.linalg.norm(genre_vectors, axis=1, keepdims=True)
+        genre_vectors /= np.where(norms > 0, norms, 1)
+        return cls(df, ids, offsets, indices, weights, genre_ids, genre_vectors)
+
+    def save(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npz")
+        ids = sorted(self.rows, key=self.rows.get)
+        np.savez_compressed(
+            tmp,
+            df=self.df.astype(np.int32),
+            ids=np.array(ids, dtype=np.int64),
+            offsets=self.offsets,
+            indices=self.indices,
+            weights=self.weights,
+            genre_ids=np.array(self.genre_ids, dtype=np.int64),
+            genre_vectors=self.genre_vectors,
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["df"].astype(np.float64),
+                data["ids"],
+                data["offsets"],
+                data["indices"],
+                data["weights"],
+                data["genre_ids"],
+                data["genre_vectors"],
+            )
+
+    def scores(self, query):
+        # Cosine of a dense query vector against every indexed movie at once.
+        return np.bincount(
+            self.row_of, weights=query[self.indices] * self.weights, minlength=len(self.rows)
+        )
+
+
+def _weigh(counts, idf):
+    # Sublinear tf times idf, L2-normalised.
+    if not counts:
+        return [], []
+    indices = list(counts)
+    weights = [(1 + math.log(count)) * idf[bucket] for bucket, count in counts.items()]
+    norm = math.sqrt(sum(weight * weight for weight in weights))
+    return indices, [weight / norm for weight in weights]
+
+
+def query_vector(text, index=None):
+    counts = _hashed_counts(tokenize(text))
+    if index is None:
+        idf = np.ones(DIMENSIONS)
+    else:
+        idf = index.idf
+        # Words no indexed movie uses cannot match anything; left in, their
+        # high idf would only dilute the words that can.
+        counts = {bucket: count for bucket, count in counts.items() if index.df[bucket]}
+    dense = np.zeros(DIMENSIONS, dtype=np.float64)
+    indices, weights = _weigh(counts, idf)
+    dense[indices] = weights
+    return dense
+
+
+def similarities(mood_text, movies, language):
+    # Cosine similarity of the mood text to each movie, as a float64 array in
+    # candidate order. Indexed movies are scored in one pass over the index;
+    # up to LOOSE_VECTORIZE_LIMIT others are vectorised together, and any
+    # beyond that score 0.
+    if not movies:
+        return np.zeros(0)
+    index = load(language)
+    query = query_vector(mood_text, index)
+    if not query.any():
+        return np.zeros(len(movies))
+
+    sims = np.zeros(len(movies))
+    loose = range(len(movies))
+    if index is not None:
+        rows = np.array([index.rows.get(movie["id"], -1) for movie in movies])
+        indexed = rows >= 0
+        if indexed.any():
+            sims[indexed] = index.scores(query)[rows[indexed]]
+        loose = np.flatnonzero(~indexed).tolist()
+    if not loose or len(loose) > LOOSE_VECTORIZE_LIMIT:
+        return sims
+
+    idf = index.idf if index is not None else np.ones(DIMENSIONS)
+    row_ids, indices, weights = _batch_vectors([movies[row] for row in loose], idf)
+    sims[loose] = np.bincount(row_ids, weights=query[indices] * weights, minlength=len(loose))
+    return sims
+
+
+def _batch_vectors(movies, idf):
+    # CSR-style (row, bucket, weight) triples for movies outside the index.
+    # Python only tokenises; tf-idf weighting and L2 norms run in NumPy.
+    row_ids = []
+    indices = []
+    counts = []
+    for position, movie in enumerate(movies):
+        for bucket, count in _hashed_counts(tokenize(movie_text(movie))).items():
+            row_ids.append(position)
+            indices.append(bucket)
+            counts.append(count)
+    row_ids = np.array(row_ids, dtype=np.int64)
+    indices = np.array(indices, dtype=np.int64)
+    weights = (1 + np.log(np.array(counts, dtype=np.float64))) * idf[indices]
+    norms = np.sqrt(np.bincount(row_ids, weights=weights * weights, minlength=len(movies)))
+    weights /= np.where(norms > 0, norms, 1)[row_ids]
+    return row_ids, indices, weights
+
+
+def match_genres(mood_text, language=None, limit=1):
+    # TMDB genre ids whose centroid is closest to the mood text, best first;
+    # empty when nothing is similar enough to filter discover by.
+    index = load(language) if language else None
+    query = query_vector(mood_text, index)
+    if not query.any():
+        return []
+    if index is not None:
+        genre_ids, genre_vectors = index.genre_ids, index.genre_vectors
+    else:
+        genre_ids, genre_vectors = _lexicon_vectors()
+    scores = genre_vectors @ query
+    order = np.argsort(-scores, kind="stable")[:limit]
+    return [genre_ids[row] for row in order if scores[row] >= GENRE_MIN_SIMILARITY]
+
+
+def _lexicon_vectors():
+    global _lexicon
+    if _lexicon is None:
+        genre_ids = sorted(GENRE_LEXICON)
+        vectors = np.stack([query_vector(GENRE_LEXICON[genre_id]) for genre_id in genre_ids])
+        _lexicon = (genre_ids, vectors)
+    return _lexicon
+
+
+def build(language, movies):
+    index = MoodIndex.build(movies)
+    index.save(_index_file(language))
+    return index
+
+
+def load(language):
+    # Returns None when no index has been built for this language.
+    path = _index_file(language)
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    with _lock:
+        cached = _indexes.get(language)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    try:
+        index = MoodIndex.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    with _lock:
+        _indexes[language] = (mtime, index)
+    return index
+
+
+def _index_file(language):
+    return INDEX_PATH / f"{language}.npz"
+
+
+def main():
+    import catalog
+
+    parser = argparse.ArgumentParser(description="Build the mood index from the local catalog.")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--language", action="append", default=None)
+    args = parser.parse_args()
+
+    for language in args.language or ["en-US", "ko-KR"]:
+        movies = catalog.load(language)
+        if movies is None:
+            print(f"{language}: no catalog, run catalog.py ingest first")
+            continue
+        build(language, movies.movies)
+        print(f"{language}: indexed {len(movies.movies)} movies")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,280 @@
+import hashlib
 import json
-from openai import OpenAI
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
+import memo
+import metrics
 import recommender
+import singleflight
 
 MODEL_NAME = "gpt-4.1-mini"
+CACHE_TTL = 600
+CACHE_MAX_ENTRIES = 512
+CACHE_MAX_BYTES = 1024 * 1024
+# Slider values within the same bucket share cached picks.
+TIME_BUCKET_MINUTES = 15
+# Only the best pre-ranked candidates are sent, and overviews are trimmed so
+# the candidate table fits the budget.
+PROMPT_TOP_K = 15
+PROMPT_TOKEN_BUDGET = 1200
+OVERVIEW_MAX_CHARS = 240
+# Rough chars-per-token for English text; used only for budgeting/reporting.
+CHARS_PER_TOKEN = 4
+# The LLM is skipped in favour of the heuristic when a request has less than
+# this many seconds left; otherwise the call gets whatever time remains.
+LLM_MIN_SECONDS = 2.0
+LLM_TIMEOUT = 30
 
+SYSTEM_MESSAGE = (
+    "You are a movie curator who minimizes decision fatigue.\n"
+    "Select exactly 3 movies from the provided candidate list.\n"
+    "Candidates are pipe-separated rows under a header line.\n"
+    "Never invent titles or IDs.\n"
+    "Return ONLY valid JSON with this shape:\n"
+    '{ "selected_ids": [<int>, <int>, <int>], "reasons": { "<id>": "<=140 chars>", ... } }\n'
+    "Rules:\n"
+    "- selected_ids must contain exactly 3 unique integers.\n"
+    "- reasons must include a reason for each selected id.\n"
+    "- Each reason must be ONE sentence and <= 140 characters.\n"
+    "- Do not include any extra keys."
+)
 
-def pick_movies(candidates, user_state, openai_api_key, feedback):
+_clients = {}
+_cache = memo.BoundedCache(CACHE_TTL, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)  # key -> raw_text
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="llm-pick")
+_prompt_stats = deque(maxlen=50)
+# Sessions asking for the same uncached picks at once share one model call.
+_flights = singleflight.Group("llm")
+
+
+def pick_movies(
+    candidates, user_state, openai_api_key, feedback=None, penalties=None, deadline=None
+):
     if not candidates:
         return [], {}, None
 
     if not openai_api_key:
-        picks = recommender.pick_top_three(candidates, user_state, feedback)
-        reasons = recommender.template_reasons(picks, user_state)
-        return picks, reasons, picks[0]["id"]
+        metrics.incr("llm_fallbacks_total", reason="no_key")
+        return _heuristic_pick(candidates, user_state, feedback, penalties)
+    if _too_late(deadline):
+        metrics.incr("llm_fallbacks_total", reason="deadline")
+        return _heuristic_pick(candidates, user_state, feedback, penalties)
 
     try:
-        raw_text = _call_openai(candidates, user_state, openai_api_key)
-        selected_ids, reasons = _validate_response(raw_text, candidates)
-        picks = [movie for movie in candidates if movie["id"] in selected_ids]
-        picks.sort(key=lambda movie: selected_ids.index(movie["id"]))
-        return picks, reasons, selected_ids[0]
+        return _llm_pick(candidates, user_state, openai_api_key, penalties, deadline)
     except Exception:
         # broad fallback to guarantee we always return a 3-tuple
-        picks = recommender.pick_top_three(candidates, user_state, feedback)
-        reasons = recommender.template_reasons(picks, user_state)
-        return picks, reasons, picks[0]["id"]
-
-
-def _call_openai(candidates, user_state, openai_api_key):
-    client = OpenAI(api_key=openai_api_key)
-
-    system_message = (
-        "You are a movie curator who minimizes decision fatigue.\n"
-        "Select exactly 3 movies from the provided candidate list.\n"
-        "Never invent titles or IDs.\n"
-        "Return ONLY valid JSON with this shape:\n"
-        '{ "selected_ids": [<int>, <int>, <int>], "reasons": { "<id>": "<=140 chars>", ... } }\n'
-        "Rules:\n"
-        "- selected_ids must contain exactly 3 unique integers.\n"
-        "- reasons must include a reason for each selected id.\n"
-        "- Each reason must be ONE sentence and <= 140 characters.\n"
-        "- Do not include any extra keys."
+        metrics.incr("llm_fallbacks_total", reason="error")
+        return _heuristic_pick(candidates, user_state, feedback, penalties)
+
+
+def pick_movies_speculative(
+    candidates, user_state, openai_api_key, feedback=None, penalties=None, deadline=None
+):
+    # Returns the heuristic picks right away plus a Future for the LLM picks
+    # (None without a key). The Future resolves to the same 3-tuple as
+    # pick_movies, or raises if the model call or validation fails.
+    if not candidates:
+        return [], {}, None, None
+
+    picks, reasons, highlight_id = _heuristic_pick(candidates, user_state, feedback, penalties)
+    if not openai_api_key:
+        metrics.incr("llm_fallbacks_total", reason="no_key")
+        return picks, reasons, highlight_id, None
+    if _too_late(deadline):
+        metrics.incr("llm_fallbacks_total", reason="deadline")
+        return picks, reasons, highlight_id, None
+    future = _executor.submit(
+        _background_llm_pick, candidates, user_state, openai_api_key, penalties, deadline
     )
+    return picks, reasons, highlight_id, future
 
-    user_message = {
-        "user_state": user_state,
-        "candidates": [
-            {
-                "tmdb_id": movie["id"],
-                "title": movie["title"],
-                "year": (movie.get("release_date") or "")[:4],
-                "runtime": movie.get("runtime"),
-                "genres": movie.get("genres", []),
-                "overview": (movie.get("overview") or "")[:240],
-                "popularity": movie.get("popularity", 0),
-                "vote_average": movie.get("vote_average", 0),
-                "vote_count": movie.get("vote_count", 0),
-            }
-            for movie in candidates
-        ],
+
+def _background_llm_pick(candidates, user_state, openai_api_key, penalties, deadline):
+    # Jobs can wait behind others on _executor, so the deadline is checked
+    # again once this one actually starts.
+    if _too_late(deadline):
+        metrics.incr("llm_fallbacks_total", reason="deadline")
+        raise RuntimeError("LLM pick skipped: deadline passed while queued")
+    try:
+        return _llm_pick(candidates, user_state, openai_api_key, penalties, deadline)
+    except Exception:
+        metrics.incr("llm_fallbacks_total", reason="error")
+        raise
+
+
+def _too_late(deadline):
+    return deadline is not None and deadline.remaining() < LLM_MIN_SECONDS
+
+
+def _heuristic_pick(candidates, user_state, feedback, penalties):
+    picks = recommender.pick_top_three(candidates, user_state, feedback, penalties)
+    reasons = recommender.template_reasons(picks, user_state)
+    return picks, reasons, picks[0]["id"]
+
+
+def _llm_pick(candidates, user_state, openai_api_key, penalties=None, deadline=None):
+    # The model only sees (and may only choose from) the pre-ranked top K.
+    prompt_candidates = recommender.score_candidates(
+        candidates, user_state, penalties=penalties
+    )[:PROMPT_TOP_K]
+    selected_ids, reasons = _cached_pick(
+        prompt_candidates, user_state, openai_api_key, deadline
+    )
+    picks = [movie for movie in prompt_candidates if movie["id"] in selected_ids]
+    picks.sort(key=lambda movie: selected_ids.index(movie["id"]))
+    return picks, reasons, selected_ids[0]
+
+
+def _cached_pick(candidates, user_state, openai_api_key, deadline=None):
+    key = cache_key(candidates, user_state)
+    _, raw_text = _cache.get(key)
+    metrics.incr("llm_cache_total", result="miss" if raw_text is None else "hit")
+
+    if raw_text is not None:
+        try:
+            # Cached answers must still be valid for this exact candidate list.
+            return _validate_response(raw_text, candidates)
+        except (ValueError, json.JSONDecodeError):
+            _cache.discard(key)
+
+    timeout = LLM_TIMEOUT if deadline is None else deadline.timeout(LLM_TIMEOUT)
+    raw_text = _flights.do(
+        key,
+        lambda: _call_openai(
+            candidates, user_state, openai_api_key, timeout, retry=deadline is None
+        ),
+        timeout=timeout,
+    )
+    result = _validate_response(raw_text, candidates)
+    _cache.put(key, raw_text)
+    return result
+
+
+def cache_key(candidates, user_state):
+    time_available = user_state.get("time_available") or 0
+    normalized = {
+        "mood_text": " ".join((user_state.get("mood_text") or "").lower().split()),
+        "energy": user_state.get("energy"),
+        "language": user_state.get("language"),
+        "time_bucket": round(time_available / TIME_BUCKET_MINUTES) * TIME_BUCKET_MINUTES,
+        "candidate_ids": sorted(movie["id"] for movie in candidates),
     }
+    raw = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+def _get_client(openai_api_key):
+    # One client (and its HTTP connection pool) per key for the whole process.
+    # The SDK is imported here rather than at module load: it dominates
+    # startup, and heuristic-only processes never need it. The import stays
+    # outside _lock so diagnostics don't wait on it.
+    from openai import OpenAI
+
+    with _lock:
+        client = _clients.get(openai_api_key)
+        if client is None:
+            client = OpenAI(api_key=openai_api_key)
+            _clients[openai_api_key] = client
+    return client
+
+
+def build_user_message(candidates, user_state, token_budget=PROMPT_TOKEN_BUDGET):
+    # Compact tabular payload: one pipe-separated row per candidate, with
+    # overviews trimmed evenly so the whole message fits token_budget.
+    header = "tmdb_id|title|year|runtime|genres|rating|votes|overview"
+    prefix = f"user_state: {json.dumps(user_state, ensure_ascii=False)}\ncandidates:\n{header}\n"
+
+    fixed = prefix + "\n".join(_candidate_row(movie, "") for movie in candidates)
+    spare_chars = max(0, token_budget - estimate_tokens(SYSTEM_MESSAGE + fixed)) * CHARS_PER_TOKEN
+    overview_chars = min(OVERVIEW_MAX_CHARS, spare_chars // max(1, len(candidates)))
+
+    rows = [
+        _candidate_row(movie, _trim(movie.get("overview") or "", overview_chars))
+        for movie in candidates
+    ]
+    return prefix + "\n".join(rows)
 
+
+def _candidate_row(movie, overview):
+    fields = [
+        movie["id"],
+        movie["title"],
+        movie.get("year") or (movie.get("release_date") or "")[:4],
+        movie.get("runtime") or "",
+        "/".join(movie.get("genres", [])),
+        round(movie.get("vote_average", 0), 1),
+        movie.get("vote_count", 0),
+        overview,
+    ]
+    return "|".join(str(field).replace("|", "/").replace("\n", " ") for field in fields)
+
+
+def _trim(text, limit):
+    if len(text) <= limit:
+        return text
+    if limit <= 1:
+        return ""
+    cut = text[: limit - 1]
+    if " " in cut:
+        cut = cut[: cut.rindex(" ")]
+    return cut + "…"
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def prompt_stats():
+    # Most recent LLM requests, newest last.
+    with _lock:
+        return list(_prompt_stats)
+
+
+def _call_openai(candidates, user_state, openai_api_key, timeout=LLM_TIMEOUT, retry=True):
+    client = _get_client(openai_api_key)
+    if not retry:
+        # The SDK retries timeouts twice by default, which would run a call
+        # sized to the request's remaining budget to about three times that.
+        client = client.with_options(max_retries=0, timeout=timeout)
+    user_message = build_user_message(candidates, user_state)
+
+    started = time.perf_counter()
     response = client.responses.create(
         model=MODEL_NAME,
         input=[
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": json.dumps(user_message, ensure_ascii=False)},
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": user_message},
         ],
         text={"format": {"type": "json_object"}},
+        timeout=timeout,
     )
 
+    metrics.observe("llm_call_seconds", time.perf_counter() - started)
+    usage = getattr(response, "usage", None)
+    with _lock:
+        _prompt_stats.append(
+            {
+                "candidates": len(candidates),
+                "estimated_tokens": estimate_tokens(SYSTEM_MESSAGE + user_message),
+                "input_tokens": getattr(usage, "input_tokens", None),
+                "output_tokens": getattr(usage, "output_tokens", None),
+                "latency_ms": round((time.perf_counter() - started) * 1000),
+            }
+        )
     return response.output_text
 
 
@@ -0,0 +1,98 @@
+import metrics
+import recommender
+import tmdb_client
+
+
+# Hydrated, unseen candidates gathered per request. One discover page usually
+# covers it; later pages are only fetched while we are still short. The app
+# used to hydrate page 1 only, so its pools never exceeded 20 despite a cap
+# of 60; 20 keeps that pool size and its cost. A 60 pool picks the same
+# three movies for about 60% of inputs (against the stubs), at three times
+# the detail fetches. The warmer uses larger pools for precomputed moods.
+CANDIDATE_TARGET = 20
+
+
+def user_state_from(inputs):
+    return {
+        "mood_text": inputs["mood_text"],
+        "time_available": inputs["time_available"],
+        "energy": inputs["energy"],
+        "language": inputs["language"],
+    }
+
+
+def pool_key(inputs):
+    return (
+        inputs["mood_text"],
+        inputs["time_available"],
+        inputs["energy"],
+        inputs["language"],
+        bool(inputs["tighten_runtime"]),
+    )
+
+
+def discover_params(api_key, inputs, deadline=None):
+    with metrics.span("genre_map"):
+        genre_map = tmdb_client.get_genre_map(api_key, inputs["language"], _deadline=deadline)
+    return recommender.build_discover_params(
+        mood_text=inputs["mood_text"],
+        energy=inputs["energy"],
+        time_available=inputs["time_available"],
+        tighten_runtime=inputs["tighten_runtime"],
+        genre_map=genre_map,
+        language=inputs["language"],
+    )
+
+
+def gather_candidates(
+    api_key, inputs, exclude_ids=(), target=CANDIDATE_TARGET, deadline=None, hedge=True
+):
+    # Raises RuntimeError when TMDB cannot be reached. With a deadline, returns
+    # whatever candidates were hydrated in time. Only interactive requests
+    # should hedge slow detail fetches.
+    params = discover_params(api_key, inputs, deadline)
+    return hydrate_candidates(
+        api_key, inputs["language"], params, exclude_ids, target, deadline, hedge
+    )
+
+
+def hydrate_candidates(
+    api_key,
+    language,
+    params,
+    exclude_ids=(),
+    target=CANDIDATE_TARGET,
+    deadline=None,
+    hedge=True,
+):
+    with metrics.span("discover_hydrate"):
+        return list(
+            tmdb_client.iter_candidates(
+                api_key,
+                language,
+                params,
+                exclude_ids=exclude_ids,
+                target=target,
+                deadline=deadline,
+                hedge=hedge,
+            )
+        )
+
+
+def pick_from_pool(pool, inputs, seen_ids, penalties=None):
+    # Re-picks locally from a candidate pool gathered earlier for the same
+    # inputs; no network. Returns (picks, reasons, highlight_id, unseen_count),
+    # or None when the pool was built for other inputs or has run dry.
+    if not pool or pool["key"] != pool_key(inputs):
+        metrics.incr("pick_pool_total", result="miss")
+        return None
+    unseen = [movie for movie in pool["candidates"] if movie["id"] not in seen_ids]
+    if len(unseen) < 3:
+        metrics.incr("pick_pool_total", result="exhausted")
+        return None
+
+    metrics.incr("pick_pool_total", result="hit")
+    user_state = user_state_from(inputs)
+    picks = recommender.pick_top_three(unseen, user_state, penalties=penalties)
+    reasons = recommender.template_reasons(picks, user_state)
+    return picks, reasons, picks[0]["id"], len(unseen)
@@ -0,0 +1,179 @@
+import hashlib
+import io
+import os
+import pathlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import metrics
+import singleflight
+
+
+IMAGE_ROOT = os.environ.get("TMDB_IMAGE_ROOT", "https://image.tmdb.org/t/p")
+CACHE_PATH = pathlib.Path(os.environ.get("POSTER_CACHE_PATH", "data/posters"))
+PLACEHOLDER = pathlib.Path(__file__).resolve().parent / "assets" / "no_poster.png"
+# TMDB poster variants by pixel width, smallest first.
+SIZES = [(92, "w92"), (154, "w154"), (185, "w185"), (342, "w342"), (500, "w500"), (780, "w780")]
+# One card in the centered layout's three columns is about 220 CSS px wide;
+# 1.5 device pixels per CSS pixel covers most phones and laptops.
+CARD_WIDTH_PX = 220
+PIXEL_RATIO = 1.5
+JPEG_QUALITY = 80
+MAX_BYTES = 64 * 1024 * 1024
+EVICT_EVERY = 50
+# Posters fetched in the background once a live pick is ranked: the picks
+# about to render plus the next two refresh rounds.
+PREFETCH_COUNT = 9
+FETCH_TIMEOUT = 5
+
+_session = requests.Session()
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="poster")
+_flights = singleflight.Group("posters")
+_lock = threading.Lock()
+_writes = 0
+
+
+def variant_for(width_px=CARD_WIDTH_PX, pixel_ratio=PIXEL_RATIO):
+    # Smallest TMDB variant at least as wide as the rendered card.
+    wanted = width_px * pixel_ratio
+    for width, size in SIZES:
+        if width >= wanted:
+            return size
+    return SIZES[-1][1]
+
+
+def variant_url(poster_path, size):
+    return f"{IMAGE_ROOT}/{size}{poster_path}"
+
+
+def poster_source(movie, width_px=CARD_WIDTH_PX):
+    # What st.image should show for this card: the cached thumbnail when we
+    # have it, otherwise the right-sized TMDB URL (and fetch it for next
+    # time), or the bundled placeholder when TMDB has no poster.
+    poster_path = movie.get("poster_path")
+    if not poster_path:
+        return str(PLACEHOLDER)
+    size = variant_for(width_px)
+    path = _cache_file(poster_path, size)
+    if path.exists():
+        metrics.incr("poster_cache_total", result="hit")
+        return str(path)
+    metrics.incr("poster_cache_total", result="miss")
+    _executor.submit(_fetch_quietly, poster_path, size, width_px)
+    return variant_url(poster_path, size)
+
+
+def prefetch(movies, width_px=CARD_WIDTH_PX):
+    size = variant_for(width_px)
+    for movie in movies[:PREFETCH_COUNT]:
+        poster_path = movie.get("poster_path")
+        if poster_path and not _cache_file(poster_path, size).exists():
+            _executor.submit(_fetch_quietly, poster_path, size, width_px)
+
+
+def fetch(poster_path, size, width_px=CARD_WIDTH_PX):
+    # Downloads one variant, re-encodes it at the card's pixel width and
+    # stores it. Returns the cached path; raises RuntimeError on failure.
+    path = _cache_file(poster_path, size)
+    if path.exists():
+        return path
+    return _flights.do(str(path), lambda: _download(poster_path, size, width_px, path))
+
+
+def _fetch_quietly(poster_path, size, width_px):
+    try:
+        fetch(poster_path, size, width_px)
+    except RuntimeError:
+        pass  # the card already points at the TMDB URL
+
+
+def _download(poster_path, size, width_px, path):
+    try:
+        response = _session.get(variant_url(poster_path, size), timeout=FETCH_TIMEOUT)
+    except requests.RequestException as exc:
+        raise RuntimeError(f"poster fetch failed: {exc}") from exc
+    if response.status_code != 200:
+        raise RuntimeError(f"poster fetch failed: {response.status_code}")
+
+    body = _reencode(response.content, round(width_px * PIXEL_RATIO))
+    metrics.incr("poster_bytes_total", len(response.content), stage="fetched")
+    metrics.incr("poster_bytes_total", len(body), stage="stored")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+    tmp.write_bytes(body)
+    os.replace(tmp, path)
+    _maybe_evict()
+    return path
+
+
+def _reencode(data, max_width):
+    # Shrinks to max_width and re-encodes as progressive JPEG; bytes that are
+    # not a decodable image are rejected rather than cached.
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError) as exc:
+        raise RuntimeError(f"poster is not an image: {exc}") from exc
+    if image.width > max_width:
+        image = image.resize(
+            (max_width, round(image.height * max_width / image.width)), Image.LANCZOS
+        )
+    out = io.BytesIO()
+    image.convert("RGB").save(
+        out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True
+    )
+    return out.getvalue()
+
+
+def _maybe_evict():
+    global _writes
+    with _lock:
+        _writes += 1
+        if _writes % EVICT_EVERY:
+            return
+    evict()
+
+
+def evict(max_bytes=MAX_BYTES):
+    # Oldest-first by mtime until the cache is back under 90% of max_bytes.
+    files = [(entry.stat().st_mtime, entry.stat().st_size, entry) for entry in _cached_files()]
+    total = sum(size for _, size, _ in files)
+    if total <= max_bytes:
+        return 0
+    removed = 0
+    for _, size, entry in sorted(files, key=lambda item: item[0]):
+        if total <= max_bytes * 0.9:
+            break
+        try:
+            entry.unlink()
+        except FileNotFoundError:
+            continue
+        total -= size
+        removed += 1
+    metrics.incr("poster_evictions_total", removed)
+    return removed
+
+
+def stats():
+    files = list(_cached_files())
+    return {
+        "files": len(files),
+        "bytes": sum(entry.stat().st_size for entry in files),
+        "max_bytes": MAX_BYTES,
+        "variant": variant_for(),
+    }
+
+
+def _cached_files():
+    if not CACHE_PATH.exists():
+        return []
+    return [entry for entry in CACHE_PATH.glob("*/*.jpg") if entry.is_file()]
+
+
+def _cache_file(poster_path, size):
+    digest = hashlib.sha256(poster_path.encode("utf-8")).hexdigest()[:32]
+    return CACHE_PATH / size / f"{digest}.jpg"
@@ -1,5 +1,15 @@
 import math
 
+import numpy as np
+
+import mood_index
+
+# Only the most recent feedback entries influence penalties.
+FEEDBACK_WINDOW = 20
+# Candidate pools at least this large are ranked with the columnar NumPy path.
+VECTORIZE_THRESHOLD = 200
+# Weight of the mood-text similarity (cosine, 0..1) in the candidate score.
+MOOD_WEIGHT = 1.0
 
 MOOD_GENRES = {
     "Comfort": ["Comedy", "Family"],
@@ -9,13 +19,31 @@ MOOD_GENRES = {
     "Weird": ["Mystery", "Science Fiction"],
 }
 
+# Sentence each mood chip in the app fills in.
+MOOD_CHIP_TEXT = {
+    "Comfort": "Something cozy and uplifting.",
+    "Laugh": "Something funny and easy.",
+    "Thrill": "Something exciting and tense.",
+    "Cry": "Something emotional and heartfelt.",
+    "Weird": "Something weird but good.",
+}
+
 
-def build_discover_params(mood_text, energy, time_available, tighten_runtime, genre_map):
+def build_discover_params(
+    mood_text, energy, time_available, tighten_runtime, genre_map, language=None
+):
     name_to_id = genre_map["name_to_id"]
     mood_key = _detect_mood_key(mood_text)
-    mood_genres = MOOD_GENRES.get(mood_key, [])
-    genre_ids = [name_to_id.get(genre) for genre in mood_genres]
-    genre_ids = [genre_id for genre_id in genre_ids if genre_id]
+    if mood_key:
+        genre_ids = [name_to_id.get(genre) for genre in MOOD_GENRES[mood_key]]
+        genre_ids = [genre_id for genre_id in genre_ids if genre_id]
+    else:
+        # Free text: the closest genre in the mood index, if any is close.
+        genre_ids = [
+            genre_id
+            for genre_id in mood_index.match_genres(mood_text, language)
+            if genre_id in genre_map["id_to_name"]
+        ]
 
     runtime_limit = time_available + 10
     if energy == "Dead" or tighten_runtime:
@@ -43,16 +71,28 @@ def _detect_mood_key(mood_text):
     return None
 
 
-def score_candidates(candidates, user_state, feedback):
+def score_candidates(candidates, user_state, feedback=None, penalties=None):
+    # `penalties` is the precomputed {genre_id: penalty} from penalty_index;
+    # without it we fall back to scanning the recent feedback window.
+    if penalties is None:
+        penalties = _feedback_penalties(feedback or [], user_state)
+    affinity = mood_affinity(candidates, user_state)
+    if len(candidates) >= VECTORIZE_THRESHOLD:
+        frame = CandidateFrame(candidates)
+        return [candidates[row] for row in frame.rank(user_state, penalties, affinity)]
+
     target_runtime = user_state["time_available"]
-    penalties = _feedback_penalties(feedback, user_state)
+    if affinity is not None:
+        affinity = affinity.tolist()
     scored = []
-    for movie in candidates:
+    for index, movie in enumerate(candidates):
         runtime = movie.get("runtime") or target_runtime
         runtime_score = 1 - min(abs(runtime - target_runtime) / target_runtime, 1)
         popularity = math.log1p(movie.get("popularity", 0))
         rating = movie.get("vote_average", 0) / 10
         score = 0.4 * runtime_score + 0.3 * rating + 0.3 * popularity
+        if affinity is not None:
+            score += MOOD_WEIGHT * affinity[index]
         for genre_id in movie.get("genre_ids", []):
             score -= penalties.get(genre_id, 0)
         scored.append((score, movie))
@@ -60,20 +100,130 @@ def score_candidates(candidates, user_state, feedback):
     return [movie for _, movie in scored]
 
 
-def pick_top_three(candidates, user_state, feedback):
-    ranked = score_candidates(candidates, user_state, feedback)
+def mood_affinity(candidates, user_state):
+    # Similarity of each candidate to the mood text, or None without one.
+    mood_text = user_state.get("mood_text")
+    if not mood_text or not candidates:
+        return None
+    return mood_index.similarities(mood_text, candidates, user_state.get("language"))
+
+
+def pick_top_three(candidates, user_state, feedback=None, penalties=None):
+    if len(candidates) >= VECTORIZE_THRESHOLD:
+        if penalties is None:
+            penalties = _feedback_penalties(feedback or [], user_state)
+        frame = CandidateFrame(candidates)
+        affinity = mood_affinity(candidates, user_state)
+        return [
+            candidates[row] for row in frame.pick_top_three(user_state, penalties, affinity)
+        ]
+
+    ranked = score_candidates(candidates, user_state, feedback, penalties)
+    ranked_genres = [set(movie.get("genre_ids", [])) for movie in ranked]
+    return [ranked[index] for index in _diverse_indexes(ranked_genres)]
+
+
+class CandidateFrame:
+    # Column-oriented view of a candidate list. Every operation mirrors the
+    # scalar code above step for step (same operand order, same stable sort),
+    # so rankings are identical, not just close.
+    def __init__(self, candidates):
+        count = len(candidates)
+        self.size = count
+        self.runtime = np.array(
+            [movie.get("runtime") or np.nan for movie in candidates], dtype=np.float64
+        )
+        # math.log1p rather than np.log1p keeps this bit-identical with the
+        # scalar path across libm implementations.
+        self.popularity = np.array(
+            [math.log1p(movie.get("popularity", 0)) for movie in candidates], dtype=np.float64
+        )
+        self.rating = np.array(
+            [movie.get("vote_average", 0) for movie in candidates], dtype=np.float64
+        ) / 10
+
+        genre_lists = [movie.get("genre_ids", []) for movie in candidates]
+        width = max((len(genres) for genres in genre_lists), default=0)
+        # Padded genre ids in each movie's own order; -1 marks padding.
+        self.genre_matrix = np.full((count, width), -1, dtype=np.int64)
+        for row, genres in enumerate(genre_lists):
+            self.genre_matrix[row, : len(genres)] = genres
+
+        distinct = sorted({genre_id for genres in genre_lists for genre_id in genres})
+        self.genre_bits = {genre_id: bit for bit, genre_id in enumerate(distinct)}
+        self.masks = None
+        if len(distinct) <= 64:
+            self.masks = np.zeros(count, dtype=np.uint64)
+            for row, genres in enumerate(genre_lists):
+                mask = 0
+                for genre_id in genres:
+                    mask |= 1 << self.genre_bits[genre_id]
+                self.masks[row] = mask
+
+    def scores(self, user_state, penalties, affinity=None):
+        target_runtime = user_state["time_available"]
+        runtime = np.where(np.isnan(self.runtime), target_runtime, self.runtime)
+        runtime_score = 1 - np.minimum(np.abs(runtime - target_runtime) / target_runtime, 1)
+        score = 0.4 * runtime_score + 0.3 * self.rating + 0.3 * self.popularity
+        if affinity is not None:
+            score = score + MOOD_WEIGHT * affinity
+        if penalties and self.genre_matrix.size:
+            lookup_ids = np.array(list(penalties), dtype=np.int64)
+            lookup_values = np.array(list(penalties.values()), dtype=np.float64)
+            order = np.argsort(lookup_ids)
+            lookup_ids, lookup_values = lookup_ids[order], lookup_values[order]
+            positions = np.searchsorted(lookup_ids, self.genre_matrix)
+            positions = np.minimum(positions, len(lookup_ids) - 1)
+            hit = lookup_ids[positions] == self.genre_matrix
+            penalty_matrix = np.where(hit, lookup_values[positions], 0.0)
+            # Subtract one genre column at a time, like the scalar loop.
+            for column in range(penalty_matrix.shape[1]):
+                score = score - penalty_matrix[:, column]
+        return score
+
+    def rank(self, user_state, penalties, affinity=None):
+        # Stable sort on the negated score == sorted(..., reverse=True).
+        return np.argsort(-self.scores(user_state, penalties, affinity), kind="stable")
+
+    def pick_top_three(self, user_state, penalties, affinity=None):
+        order = self.rank(user_state, penalties, affinity)
+        if self.masks is None:
+            ranked_genres = [
+                set(self.genre_matrix[row][self.genre_matrix[row] >= 0].tolist()) for row in order
+            ]
+            return [int(order[index]) for index in _diverse_indexes(ranked_genres)]
+
+        ranked_masks = self.masks[order]
+        picks = []
+        used = np.uint64(0)
+        position = 0
+        while len(picks) < 3 and position < self.size:
+            if used:
+                # Next movie that adds at least one genre we haven't shown yet.
+                novel = np.flatnonzero(ranked_masks[position:] & ~used)
+                if not novel.size:
+                    break
+                position += int(novel[0])
+            picks.append(order[position])
+            used |= ranked_masks[position]
+            position += 1
+        if len(picks) < 3:
+            picks = list(order[:3])
+        return [int(row) for row in picks]
+
+
+def _diverse_indexes(ranked_genres):
     picks = []
     used_genres = set()
-    for movie in ranked:
-        movie_genres = set(movie.get("genre_ids", []))
+    for index, movie_genres in enumerate(ranked_genres):
         if used_genres and movie_genres.issubset(used_genres):
             continue
-        picks.append(movie)
+        picks.append(index)
         used_genres.update(movie_genres)
         if len(picks) == 3:
             break
     if len(picks) < 3:
-        picks = ranked[:3]
+        picks = list(range(min(3, len(ranked_genres))))
     return picks
 
 
@@ -91,7 +241,7 @@ def template_reasons(movies, user_state):
 def _feedback_penalties(feedback, user_state):
     penalties = {}
     mood_words = set(user_state["mood_text"].lower().split())
-    for entry in feedback[-20:]:
+    for entry in feedback[-FEEDBACK_WINDOW:]:
         if entry.get("result") != "no":
             continue
         if entry.get("energy") != user_state["energy"]:
@@ -0,0 +1,120 @@
+from array import array
+
+
+# Per-session cap on remembered ids; the oldest are forgotten first.
+MAX_SEEN_IDS = 500
+
+
+class Movie:
+    # One hydrated TMDB movie. The same object is shared by the in-process
+    # TMDB cache, every session's candidate pool and the rendered picks, so it
+    # is never mutated after construction. Reads work like the dicts it
+    # replaced: movie["title"], movie.get("runtime"), movie.to_dict().
+    __slots__ = (
+        "id",
+        "title",
+        "release_date",
+        "runtime",
+        "overview",
+        "poster_path",
+        "trailer_url",
+        "genres",
+        "genre_ids",
+        "vote_average",
+        "vote_count",
+        "popularity",
+    )
+
+    def __init__(
+        self,
+        id,
+        title,
+        release_date="",
+        runtime=None,
+        overview="",
+        poster_path=None,
+        trailer_url=None,
+        genres=(),
+        genre_ids=(),
+        vote_average=0,
+        vote_count=0,
+        popularity=0,
+    ):
+        self.id = id
+        self.title = title
+        self.release_date = release_date or ""
+        self.runtime = runtime
+        self.overview = overview or ""
+        self.poster_path = poster_path
+        self.trailer_url = trailer_url
+        self.genres = tuple(genres)
+        self.genre_ids = tuple(genre_ids)
+        self.vote_average = vote_average
+        self.vote_count = vote_count
+        self.popularity = popularity
+
+    @property
+    def year(self):
+        return self.release_date[:4]
+
+    def __getitem__(self, key):
+        if key not in _KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in _KEYS:
+            return default
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in _KEYS
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: data[field] for field in cls.__slots__ if field in data})
+
+    def __reduce__(self):
+        # Positional tuple rather than a per-object dict of slot names.
+        return Movie, tuple(getattr(self, field) for field in self.__slots__)
+
+    def __repr__(self):
+        return f"Movie(id={self.id!r}, title={self.title!r})"
+
+
+_KEYS = frozenset(Movie.__slots__) | {"year"}
+
+
+class SeenIds:
+    # Ids already shown to one session, oldest first, in a uint32 array: four
+    # bytes per id instead of a set slot plus an int object. Capped at
+    # `limit`; membership is a linear scan, which at this size is faster than
+    # it sounds.
+    def __init__(self, ids=(), limit=MAX_SEEN_IDS):
+        self.limit = limit
+        self._ids = array("I")
+        self.update(ids)
+
+    def __contains__(self, movie_id):
+        return movie_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def update(self, ids):
+        for movie_id in ids:
+            if movie_id not in self._ids:
+                self._ids.append(movie_id)
+        overflow = len(self._ids) - self.limit
+        if overflow > 0:
+            del self._ids[:overflow]
+
+    def difference_update(self, ids):
+        dropped = set(ids)
+        self._ids = array("I", (movie_id for movie_id in self._ids if movie_id not in dropped))
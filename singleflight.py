@@ -0,0 +1,48 @@
+import threading
+
+import metrics
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    # Concurrent callers asking for the same key share one in-flight call:
+    # the first runs it, the rest wait for its result (or its exception).
+    # Nothing is remembered once the call finishes; caching stays with the
+    # caller.
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call
+
+    def do(self, key, func, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.incr("singleflight_coalesced_total", group=self.name)
+            if not call.done.wait(timeout):
+                raise RuntimeError(f"{self.name}: timed out waiting for in-flight call")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.incr("singleflight_leader_total", group=self.name)
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -1,36 +1,117 @@
+import contextlib
 import datetime
 import json
+import os
 import pathlib
 
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are still line-atomic enough for local use
+    fcntl = None
+
 
 DATA_PATH = pathlib.Path("data")
-FEEDBACK_FILE = DATA_PATH / "feedback.json"
+FEEDBACK_FILE = DATA_PATH / "feedback.jsonl"
+LEGACY_FEEDBACK_FILE = DATA_PATH / "feedback.json"
+LOCK_FILE = DATA_PATH / "feedback.lock"
+TAIL_BLOCK_SIZE = 8192
 
 
-def read_feedback():
+def read_feedback(limit=None):
+    # Returns entries oldest first. With a limit only the tail of the log is
+    # read, so the cost does not grow with the history.
+    migrate_legacy()
     if not FEEDBACK_FILE.exists():
         return []
+    if limit is None:
+        lines = FEEDBACK_FILE.read_bytes().splitlines()
+    else:
+        lines = _tail_lines(FEEDBACK_FILE, limit)
+    return [entry for entry in map(_parse_line, lines) if entry is not None]
+
+
+def save_feedback(tmdb_id, mood_text, time_available, energy, result, genre_ids=None):
+    migrate_legacy()
+    entry = {
+        "date": _today(),
+        "tmdb_id": tmdb_id,
+        "mood_text": mood_text,
+        "time_available": time_available,
+        "energy": energy,
+        "result": result,
+        "genre_ids": genre_ids or [],
+    }
+    line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+    with file_lock():
+        with FEEDBACK_FILE.open("ab") as handle:
+            handle.write(line)
+            handle.flush()
+            os.fsync(handle.fileno())
+    return entry
+
+
+def _tail_lines(path, limit):
+    if limit <= 0:
+        return []
+    with path.open("rb") as handle:
+        handle.seek(0, os.SEEK_END)
+        position = handle.tell()
+        buffer = b""
+        # limit + 1 newlines guarantees `limit` complete lines at the end.
+        while position > 0 and buffer.count(b"\n") <= limit:
+            step = min(TAIL_BLOCK_SIZE, position)
+            position -= step
+            handle.seek(position)
+            buffer = handle.read(step) + buffer
+    return buffer.splitlines()[-limit:]
+
+
+def _parse_line(line):
+    if not line.strip():
+        return None
     try:
-        return json.loads(FEEDBACK_FILE.read_text(encoding="utf-8"))
+        return json.loads(line)
     except json.JSONDecodeError:
-        return []
+        # a torn write from a crashed process; skip it
+        return None
 
 
-def save_feedback(tmdb_id, mood_text, time_available, energy, result, genre_ids=None):
+def migrate_legacy():
+    # One-time conversion of the old whole-file JSON array into the JSONL log.
+    # It takes file_lock, so code that reads the log under that lock must
+    # call this first.
+    if not LEGACY_FEEDBACK_FILE.exists():
+        return
+    with file_lock():
+        if not LEGACY_FEEDBACK_FILE.exists():
+            return
+        try:
+            entries = json.loads(LEGACY_FEEDBACK_FILE.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            entries = []
+        existing = FEEDBACK_FILE.read_bytes() if FEEDBACK_FILE.exists() else b""
+        migrated = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+        tmp = FEEDBACK_FILE.with_suffix(".tmp")
+        tmp.write_bytes(migrated.encode("utf-8") + existing)
+        os.replace(tmp, FEEDBACK_FILE)
+        LEGACY_FEEDBACK_FILE.rename(LEGACY_FEEDBACK_FILE.with_suffix(".json.migrated"))
+
+
+@contextlib.contextmanager
+def file_lock():
     DATA_PATH.mkdir(parents=True, exist_ok=True)
-    feedback = read_feedback()
-    feedback.append(
-        {
-            "date": _today(),
-            "tmdb_id": tmdb_id,
-            "mood_text": mood_text,
-            "time_available": time_available,
-            "energy": energy,
-            "result": result,
-            "genre_ids": genre_ids or [],
-        }
-    )
-    FEEDBACK_FILE.write_text(json.dumps(feedback, indent=2), encoding="utf-8")
+    with LOCK_FILE.open("a") as lock_handle:
+        if fcntl is not None:
+            # Shows up as lock contention in the request waterfall.
+            with metrics.span("feedback_lock_wait"):
+                fcntl.flock(lock_handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_handle, fcntl.LOCK_UN)
 
 
 def _today():
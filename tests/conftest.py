@@ -0,0 +1,14 @@
+import pathlib
+import sys
+
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True)
+def scratch_dir(tmp_path, monkeypatch):
+    # Modules keep their state under relative data/ paths.
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
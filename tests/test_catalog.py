@@ -0,0 +1,46 @@
+import catalog
+import records
+import tmdb_client
+
+
+def make_catalog(tmp_path, monkeypatch, count):
+    monkeypatch.setattr(catalog, "CATALOG_PATH", tmp_path / "catalog")
+    movies = [
+        records.Movie(
+            id=movie_id,
+            title=f"Movie {movie_id}",
+            runtime=100,
+            genre_ids=(35,),
+            popularity=1000 - movie_id,
+            vote_count=500,
+        )
+        for movie_id in range(1, count + 1)
+    ]
+    catalog._write("en-US", movies)
+    return movies
+
+
+def test_query_past_the_last_catalog_page_is_empty(tmp_path, monkeypatch):
+    make_catalog(tmp_path, monkeypatch, 50)
+    assert len(catalog.query("en-US", {"page": 1})) == 50
+    assert catalog.query("en-US", {"page": 2}) == []
+
+
+def test_query_falls_back_when_page_one_has_no_match(tmp_path, monkeypatch):
+    make_catalog(tmp_path, monkeypatch, 50)
+    assert catalog.query("en-US", {"page": 1, "with_genres": "27"}) is None
+    assert catalog.query("ko-KR", {"page": 1}) is None
+
+
+def test_iter_candidates_stays_inside_the_catalog(tmp_path, monkeypatch):
+    movies = make_catalog(tmp_path, monkeypatch, 50)
+    live_calls = []
+
+    def live(*args, **kwargs):
+        live_calls.append(args)
+        return [{"id": 10_000 + len(live_calls)}]
+
+    monkeypatch.setattr(tmdb_client, "discover_movies_live", live)
+    candidates = list(tmdb_client.iter_candidates("key", "en-US", {}, target=60))
+    assert live_calls == []
+    assert {movie["id"] for movie in candidates} == {movie.id for movie in movies}
@@ -0,0 +1,52 @@
+import records
+import tmdb_client
+
+
+def fake_discover(monkeypatch, pages=5, per_page=20):
+    calls = []
+
+    def discover(api_key, language, params, deadline=None):
+        page = params["page"]
+        calls.append(page)
+        if page > pages:
+            return []
+        first = (page - 1) * per_page + 1
+        return [
+            records.Movie(id=movie_id, title=f"Movie {movie_id}")
+            for movie_id in range(first, first + per_page)
+        ]
+
+    monkeypatch.setattr(tmdb_client, "discover_movies", discover)
+    return calls
+
+
+def test_first_page_meeting_the_target_is_the_only_discover_call(monkeypatch):
+    calls = fake_discover(monkeypatch)
+    candidates = list(tmdb_client.iter_candidates("key", "en-US", {}, target=20))
+    assert len(candidates) == 20
+    assert calls == [1]
+
+
+def test_short_page_fetches_the_next_one(monkeypatch):
+    calls = fake_discover(monkeypatch)
+    candidates = list(tmdb_client.iter_candidates("key", "en-US", {}, target=30))
+    assert len(candidates) == 30
+    assert calls == [1, 2]
+
+
+def test_seen_ids_pull_later_pages(monkeypatch):
+    calls = fake_discover(monkeypatch)
+    candidates = list(
+        tmdb_client.iter_candidates(
+            "key", "en-US", {}, exclude_ids=set(range(1, 31)), target=20
+        )
+    )
+    assert [movie["id"] for movie in candidates] == list(range(31, 51))
+    assert calls == [1, 2, 3]
+
+
+def test_stream_ends_when_discover_runs_out(monkeypatch):
+    calls = fake_discover(monkeypatch, pages=2)
+    candidates = list(tmdb_client.iter_candidates("key", "en-US", {}, target=60))
+    assert len(candidates) == 40
+    assert calls == [1, 2, 3]
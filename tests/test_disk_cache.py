@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+import deadline
+import disk_cache
+import tmdb_client
+
+
+@pytest.fixture(autouse=True)
+def cache_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(disk_cache, "CACHE_FILE", tmp_path / "cache.sqlite3")
+    monkeypatch.setattr(disk_cache, "_local", threading.local())
+
+
+def wait_for_refreshes():
+    for _ in range(200):
+        if not disk_cache._refreshing:
+            return
+        time.sleep(0.01)
+    raise AssertionError("background refresh did not finish")
+
+
+def record_gets(monkeypatch):
+    deadlines = []
+
+    def get(url, params, deadline=None, on_send=None):
+        deadlines.append(deadline)
+        return {"fresh": True}
+
+    monkeypatch.setattr(tmdb_client, "_get", get)
+    return deadlines
+
+
+def test_stale_refresh_does_not_inherit_the_request_deadline(monkeypatch):
+    key_parts = ["en-US", {"page": 1}]
+    disk_cache.store("discover", key_parts, {"fresh": False})
+    monkeypatch.setitem(disk_cache.TTLS, "discover", -1)
+    deadlines = record_gets(monkeypatch)
+
+    value = tmdb_client._get_cached(
+        "discover", key_parts, "http://tmdb/discover", {}, deadline.Deadline(0.01)
+    )
+    wait_for_refreshes()
+
+    assert value == {"fresh": False}
+    assert deadlines == [None]
+    assert disk_cache.lookup("discover", key_parts, max_age=60) == {"fresh": True}
+
+
+def test_fallback_refresh_does_not_inherit_the_request_deadline(monkeypatch):
+    deadlines = record_gets(monkeypatch)
+
+    value = tmdb_client._get_cached(
+        "genres", ["en-US"], "http://tmdb/genres", {}, deadline.Deadline(0.01),
+        fallback={"genres": []},
+    )
+    wait_for_refreshes()
+
+    assert value == {"genres": []}
+    assert deadlines == [None]
+
+
+def test_foreground_miss_keeps_the_request_deadline(monkeypatch):
+    deadlines = record_gets(monkeypatch)
+    request_deadline = deadline.Deadline(5)
+
+    tmdb_client._get_cached("discover", ["ko-KR"], "http://tmdb/discover", {}, request_deadline)
+
+    assert deadlines == [request_deadline]
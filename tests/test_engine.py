@@ -0,0 +1,36 @@
+import engine
+import records
+
+
+def movie(movie_id, popularity):
+    return records.Movie(
+        id=movie_id,
+        title=f"M{movie_id}",
+        runtime=100,
+        poster_path=f"/p{movie_id}.jpg",
+        genre_ids=[35],
+        vote_average=7,
+        popularity=popularity,
+    )
+
+
+def test_poster_prefetch_covers_picks_then_ranked_pool(monkeypatch):
+    prefetched = []
+    monkeypatch.setattr(engine.posters, "prefetch", prefetched.extend)
+    # Discover order is the reverse of rank order.
+    candidates = [movie(movie_id, movie_id) for movie_id in range(1, 21)]
+    picks = [candidates[0], candidates[5], candidates[10]]
+    user_state = {"time_available": 100, "mood_text": ""}
+
+    engine._prefetch_posters(picks, candidates, user_state, {})
+
+    ids = [movie["id"] for movie in prefetched]
+    assert ids[:3] == [1, 6, 11]
+    assert ids[3:] == [20, 19, 18, 17, 16, 15]
+
+
+def test_no_poster_prefetch_without_picks(monkeypatch):
+    prefetched = []
+    monkeypatch.setattr(engine.posters, "prefetch", prefetched.extend)
+    engine._prefetch_posters([], [movie(1, 1)], {"time_available": 100}, {})
+    assert prefetched == []
@@ -0,0 +1,63 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import engine
+
+
+@pytest.fixture
+def server(monkeypatch):
+    def pick_batch(states, tmdb_api_key, openai_api_key, workers):
+        return [
+            {"picks": [], "reasons": {}, "highlight_id": None, "candidate_count": 0}
+            for _ in states
+        ]
+
+    monkeypatch.setattr(engine, "pick_batch", pick_batch)
+    httpd = engine.serve("tmdb-key", None, port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/picks"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post(url, body):
+    request = urllib.request.Request(url, data=body, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read())
+
+
+@pytest.mark.parametrize(
+    "body, message",
+    [
+        (b"[1, 2]", 'expected {"states": [...]}'),
+        (b'"states"', 'expected {"states": [...]}'),
+        (b'{"states": {"mood_text": "x"}}', 'expected {"states": [...]}'),
+        (b"{not json", "Expecting property name"),
+        (b'{"states": [1]}', "each state must be an object"),
+        (b'{"states": [{"mood_text": 5}]}', "mood_text must be a string"),
+        (b'{"states": [{"energy": ["Okay"]}]}', "energy must be a string"),
+        (b'{"states": [{"time_available": "soon"}]}', "time_available must be a number"),
+        (b'{"states": [{"time_available": 1e400}]}', "time_available must be a number"),
+        (b'{"states": [{"time_available": Infinity}]}', "time_available must be a number"),
+        (b'{"states": [{"time_available": NaN}]}', "time_available must be a number"),
+        (b'{"states": [{"seen_ids": 3}]}', "seen_ids must be a list of integers"),
+    ],
+)
+def test_malformed_bodies_get_a_400(server, body, message):
+    status, payload = post(server, body)
+    assert status == 400
+    assert message in payload["error"]
+
+
+def test_valid_body_gets_one_result_per_state(server):
+    body = json.dumps({"states": [{"mood_text": "funny"}, {"seen_ids": [1, 2]}]}).encode()
+    status, payload = post(server, body)
+    assert status == 200
+    assert len(payload["results"]) == 2
@@ -0,0 +1,57 @@
+import threading
+import time
+
+import records
+import tmdb_client
+import tmdb_transport
+
+
+def fake_details(queued, in_flight, hedges):
+    # queued: time before the request goes out (token wait, disk cache);
+    # in_flight: time on the wire after on_send.
+    lock = threading.Lock()
+
+    def get_movie_details(api_key, movie_id, language, _deadline=None, _hedge=False, _on_send=None):
+        if _hedge:
+            with lock:
+                hedges.append(movie_id)
+            time.sleep(in_flight)
+        else:
+            time.sleep(queued)
+            if _on_send is not None:
+                _on_send()
+            time.sleep(in_flight)
+        return records.Movie(id=movie_id, title=f"M{movie_id}")
+
+    return get_movie_details
+
+
+def run(monkeypatch, queued, in_flight, ids=8, **kwargs):
+    hedges = []
+    monkeypatch.setattr(tmdb_client, "get_movie_details", fake_details(queued, in_flight, hedges))
+    monkeypatch.setattr(tmdb_client, "_hedge_delay", lambda: 0.1)
+    monkeypatch.setattr(tmdb_transport, "_transport", tmdb_transport.Transport())
+    movies = list(
+        tmdb_client.get_movie_details_many("key", list(range(ids)), "en-US", **kwargs)
+    )
+    assert sorted(movie["id"] for movie in movies) == list(range(ids))
+    return hedges
+
+
+def test_time_before_the_request_is_sent_does_not_trigger_hedges(monkeypatch):
+    assert run(monkeypatch, queued=0.3, in_flight=0.01) == []
+
+
+def test_slow_round_trips_are_hedged(monkeypatch):
+    assert len(run(monkeypatch, queued=0.0, in_flight=0.3)) == 8
+
+
+def test_no_hedges_without_hedge(monkeypatch):
+    assert run(monkeypatch, queued=0.0, in_flight=0.3, hedge=False) == []
+
+
+def test_no_hedges_while_the_limiter_makes_callers_wait(monkeypatch):
+    transport = tmdb_transport.Transport()
+    transport.limiter.pause(5)
+    monkeypatch.setattr(tmdb_transport, "get_transport", lambda: transport)
+    assert run(monkeypatch, queued=0.0, in_flight=0.3) == []
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import mood_index
+import records
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(mood_index, "INDEX_PATH", tmp_path / "mood_index")
+    monkeypatch.setattr(mood_index, "_indexes", {})
+
+
+def movie(movie_id, title, genre_ids, overview=""):
+    return records.Movie(id=movie_id, title=title, genre_ids=genre_ids, overview=overview)
+
+
+MOVIES = [
+    movie(1, "Laugh Riot", (35,), "Two friends get into hilarious trouble."),
+    movie(2, "Dark Harbor", (80, 53), "A detective chases a gang through the docks."),
+    movie(3, "Star Drift", (878, 12), "A crew explores a dying world."),
+]
+
+
+def reference(mood_text, movies, index=None):
+    # One movie at a time, as MoodIndex.build weighs rows.
+    idf = index.idf if index is not None else np.ones(mood_index.DIMENSIONS)
+    query = mood_index.query_vector(mood_text, index)
+    sims = []
+    for item in movies:
+        counts = mood_index._hashed_counts(mood_index.tokenize(mood_index.movie_text(item)))
+        indices, weights = mood_index._weigh(counts, idf)
+        sims.append(sum(query[bucket] * weight for bucket, weight in zip(indices, weights)))
+    return np.array(sims)
+
+
+def test_unindexed_batch_matches_per_movie_vectors():
+    sims = mood_index.similarities("something funny", MOVIES, "en-US")
+    assert sims == pytest.approx(reference("something funny", MOVIES))
+    assert sims.argmax() == 0
+
+
+def test_unindexed_batch_uses_the_index_idf():
+    index = mood_index.build("en-US", MOVIES[1:])
+    sims = mood_index.similarities("a dark detective", MOVIES, "en-US")
+    assert sims[0] == pytest.approx(reference("a dark detective", MOVIES[:1], index)[0])
+    assert sims[1] > 0
+
+
+def test_large_unindexed_pools_skip_affinity(monkeypatch):
+    monkeypatch.setattr(mood_index, "LOOSE_VECTORIZE_LIMIT", 2)
+    mood_index.build("en-US", MOVIES[1:2])
+    sims = mood_index.similarities("a dark detective or something funny", MOVIES, "en-US")
+    # Movie 2 is indexed and still scored; the two loose ones exceed the limit.
+    assert sims[1] > 0
+    assert sims[0] == 0 and sims[2] == 0
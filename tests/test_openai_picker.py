@@ -0,0 +1,74 @@
+import json
+import types
+
+import pytest
+
+import deadline
+import openai_picker
+import records
+
+
+CANDIDATES = [
+    records.Movie(id=movie_id, title=f"M{movie_id}", genres=["Drama"], genre_ids=[18])
+    for movie_id in range(1, 6)
+]
+USER_STATE = {"mood_text": "", "time_available": 120, "energy": "Okay", "language": "en-US"}
+
+
+class FakeClient:
+    def __init__(self):
+        self.options = []
+        self.calls = 0
+        self.responses = self
+
+    def with_options(self, **options):
+        self.options.append(options)
+        return self
+
+    def create(self, **kwargs):
+        self.calls += 1
+        text = json.dumps({"selected_ids": [1, 2, 3], "reasons": {"1": "a", "2": "b", "3": "c"}})
+        return types.SimpleNamespace(output_text=text, usage=None)
+
+
+class Clock:
+    # A deadline whose remaining() answers from a script.
+    def __init__(self, *remaining):
+        self.values = list(remaining)
+
+    def remaining(self):
+        return self.values.pop(0) if len(self.values) > 1 else self.values[0]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeClient()
+    monkeypatch.setattr(openai_picker, "_get_client", lambda key: fake)
+    openai_picker.clear_cache()
+    yield fake
+    openai_picker.clear_cache()
+
+
+def test_calls_under_a_deadline_do_not_retry(client):
+    picks, _, _ = openai_picker.pick_movies(
+        CANDIDATES, USER_STATE, "key", deadline=deadline.Deadline(5)
+    )
+    assert [movie["id"] for movie in picks] == [1, 2, 3]
+    assert client.options[0]["max_retries"] == 0
+    assert client.options[0]["timeout"] <= 5
+
+
+def test_calls_without_a_deadline_keep_sdk_retries(client):
+    openai_picker.pick_movies(CANDIDATES, USER_STATE, "key")
+    assert client.calls == 1
+    assert client.options == []
+
+
+def test_speculative_job_started_after_the_deadline_skips_the_call(client):
+    # Enough time left at submit, none once the queued job starts.
+    _, _, _, future = openai_picker.pick_movies_speculative(
+        CANDIDATES, USER_STATE, "key", deadline=Clock(5, 0)
+    )
+    with pytest.raises(RuntimeError):
+        future.result(timeout=5)
+    assert client.calls == 0
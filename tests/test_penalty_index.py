@@ -0,0 +1,79 @@
+import pytest
+
+import penalty_index
+import storage
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    monkeypatch.setattr(penalty_index, "_index", None)
+    monkeypatch.setattr(penalty_index, "_loaded_mtime", None)
+
+
+def save(mood_text, genre_ids, result="no", energy="Okay"):
+    return storage.save_feedback(1, mood_text, 120, energy, result, genre_ids)
+
+
+def state(mood_text, energy="Okay"):
+    return {"mood_text": mood_text, "energy": energy}
+
+
+def test_record_without_an_index_file_rebuilds_from_the_log():
+    save("funny night", [35])
+    save("funny night", [35, 18])
+    assert not penalty_index.INDEX_FILE.exists()
+
+    penalty_index.record(save("funny night", [35]))
+
+    # Log entries are dated to the day, so they have decayed for a few hours.
+    penalties = penalty_index.get_penalties(state("funny"))
+    assert penalties == pytest.approx(penalty_index.rebuild().penalties(state("funny")))
+    assert penalties[35] == pytest.approx(3 * penalty_index.PENALTY_PER_NO, rel=0.05)
+    assert penalties[18] == pytest.approx(penalty_index.PENALTY_PER_NO, rel=0.05)
+
+
+def test_record_with_a_corrupt_index_file_rebuilds_from_the_log():
+    save("scary", [27])
+    penalty_index.INDEX_FILE.write_text("{not json", encoding="utf-8")
+
+    penalty_index.record(save("scary", [27]))
+
+    penalties = penalty_index.get_penalties(state("scary"))
+    assert penalties[27] == pytest.approx(2 * penalty_index.PENALTY_PER_NO, rel=0.05)
+
+
+def test_entries_sharing_a_token_add_up():
+    index = penalty_index.PenaltyIndex(half_life_days=None)
+    index.add({"result": "no", "energy": "Okay", "mood_text": "funny", "genre_ids": [35]})
+    index.add({"result": "no", "energy": "Okay", "mood_text": "funny", "genre_ids": [35]})
+    assert index.penalties(state("funny")) == {35: pytest.approx(0.30)}
+
+
+def test_tokens_combine_with_max_not_sum():
+    # Changed from the old per-entry scan, which gave 0.30 here: two "no"s
+    # under different mood words count as the strongest one.
+    index = penalty_index.PenaltyIndex(half_life_days=None)
+    index.add({"result": "no", "energy": "Okay", "mood_text": "funny", "genre_ids": [35]})
+    index.add({"result": "no", "energy": "Okay", "mood_text": "scary", "genre_ids": [35]})
+    assert index.penalties(state("funny scary")) == {35: pytest.approx(0.15)}
+
+
+def test_one_entry_counts_once_across_shared_tokens():
+    index = penalty_index.PenaltyIndex(half_life_days=None)
+    index.add({"result": "no", "energy": "Okay", "mood_text": "funny night", "genre_ids": [35]})
+    assert index.penalties(state("funny night")) == {35: pytest.approx(0.15)}
+
+
+def test_rebuild_migrates_the_legacy_feedback_file_first():
+    storage.DATA_PATH.mkdir(parents=True, exist_ok=True)
+    storage.LEGACY_FEEDBACK_FILE.write_text(
+        '[{"tmdb_id": 1, "mood_text": "sad", "time_available": 120, "energy": "Okay",'
+        ' "result": "no", "genre_ids": [18], "timestamp": "2026-01-01T00:00:00"}]',
+        encoding="utf-8",
+    )
+
+    index = penalty_index.rebuild()
+
+    assert not storage.LEGACY_FEEDBACK_FILE.exists()
+    assert len(storage.read_feedback()) == 1
+    assert 18 in index.penalties(state("sad"))
@@ -0,0 +1,34 @@
+import threading
+import time
+
+import pytest
+
+import tmdb_transport
+
+
+def test_overlapping_pauses_wait_for_the_longest_not_the_sum():
+    bucket = tmdb_transport.TokenBucket(rate=20, capacity=20)
+    bucket.pause(1)
+    bucket.pause(1)
+    assert bucket.stats()["tokens"] == pytest.approx(-20, abs=0.5)
+
+    started = time.monotonic()
+    bucket.acquire()
+    assert 0.9 <= time.monotonic() - started < 1.5
+
+
+def test_concurrent_pauses_do_not_stack():
+    bucket = tmdb_transport.TokenBucket(rate=40, capacity=40)
+    threads = [threading.Thread(target=bucket.pause, args=(1,)) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert bucket.stats()["tokens"] == pytest.approx(-40, abs=1)
+
+
+def test_longer_pause_extends_a_shorter_one():
+    bucket = tmdb_transport.TokenBucket(rate=10, capacity=10)
+    bucket.pause(0.5)
+    bucket.pause(2)
+    assert bucket.stats()["tokens"] == pytest.approx(-20, abs=0.5)
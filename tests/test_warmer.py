@@ -0,0 +1,41 @@
+import records
+import recommender
+import warmer
+
+
+def movie(movie_id, genre_id, popularity):
+    return records.Movie(
+        id=movie_id,
+        title=f"M{movie_id}",
+        runtime=120,
+        genres=["Drama"],
+        genre_ids=[genre_id],
+        vote_average=7,
+        popularity=popularity,
+    )
+
+
+def test_warm_picks_apply_feedback_penalties(monkeypatch):
+    # Comedies (35) are the most popular, but feedback has penalised them.
+    candidates = [movie(index, 35, 1000) for index in range(1, 6)]
+    candidates += [movie(index, 18 + index, 10) for index in range(6, 12)]
+    store = {}
+    monkeypatch.setattr(warmer.pipeline, "gather_candidates", lambda *args, **kwargs: candidates)
+    monkeypatch.setattr(warmer.penalty_index, "get_penalties", lambda user_state: {35: 50.0})
+    monkeypatch.setattr(
+        warmer.disk_cache, "store", lambda namespace, key, value: store.update({namespace: value})
+    )
+    monkeypatch.setattr(warmer.disk_cache, "lookup", lambda namespace, key: store.get(namespace))
+    inputs = {
+        "mood_text": next(iter(recommender.MOOD_CHIP_TEXT.values())),
+        "time_available": 120,
+        "energy": "Okay",
+        "language": "en-US",
+        "tighten_runtime": False,
+    }
+
+    assert warmer.warm_one("tmdb-key", None, inputs)
+    picks, _, _, _ = warmer.lookup_picks(inputs, set())
+
+    assert all(35 not in pick["genre_ids"] for pick in picks)
+    assert all(35 in row["genre_ids"] for row in store["warm"]["candidates"][-5:])
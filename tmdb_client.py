@@ -1,74 +1,400 @@
-import requests
-import streamlit as st
+import argparse
+import functools
+import inspect
+import json
+import os
+import pathlib
+from collections import deque
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
+import catalog
+import disk_cache
+import memo
+import metrics
+import records
+import singleflight
+import tmdb_transport
 
-BASE_URL = "https://api.themoviedb.org/3"
-IMAGE_BASE = "https://image.tmdb.org/t/p/w500"
 
+BASE_URL = os.environ.get("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+# Raw /genre/movie/list payloads per language, shipped with the app so a new
+# process has genre maps before its first TMDB round trip.
+GENRE_SNAPSHOT_FILE = pathlib.Path(__file__).resolve().parent / "assets" / "genre_maps.json"
+SNAPSHOT_LANGUAGES = ("en-US", "ko-KR")
+MAX_DISCOVER_PAGES = 10
+# A detail fetch still running after the observed p95 latency gets a duplicate
+# request; whichever answers first wins.
+HEDGE_PERCENTILE = 95
+HEDGE_DEFAULT_DELAY = 0.5
+HEDGE_MIN_DELAY = 0.05
+HEDGE_WORKERS = 4
 
-def _get(url, params):
-    response = requests.get(url, params=params, timeout=10)
-    if response.status_code != 200:
-        raise RuntimeError(f"TMDB request failed: {response.status_code}")
-    return response.json()
+# The in-process caches do not deduplicate concurrent misses, so when an entry
+# expires every session would otherwise refetch it at once.
+_flights = singleflight.Group("tmdb")
+_caches = {}  # function name -> memo.BoundedCache
+_genre_snapshot = None
 
 
-@st.cache_data(show_spinner=False, ttl=3600)
-def get_genre_map(api_key, language):
+def _get(url, params, deadline=None, on_send=None):
+    return tmdb_transport.get_transport().get(
+        url, params, timeout=10, deadline=deadline, on_send=on_send
+    )
+
+
+def _get_cached(
+    namespace,
+    key_parts,
+    url,
+    params,
+    deadline=None,
+    coalesce=True,
+    fallback=None,
+    on_send=None,
+):
+    # Raw TMDB payloads are shared across processes through the disk cache and
+    # concurrent misses within a process share one request. key_parts never
+    # includes the API key. Background refreshes of stale entries outlive the
+    # request, so they get neither its deadline nor its on_send hook.
+    def load():
+        return disk_cache.cached(
+            namespace,
+            key_parts,
+            lambda: _get(url, params, deadline, on_send),
+            fallback,
+            refresh_loader=lambda: _get(url, params),
+        )
+
+    if not coalesce:
+        return load()
+    key = disk_cache.make_key(namespace, key_parts)
+    return _flights.do(key, load, timeout=None if deadline is None else deadline.remaining())
+
+
+def transport_stats():
+    return tmdb_transport.get_transport().stats()
+
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+
+def _counted_cache(ttl, max_entries, max_bytes):
+    # Bounded in-process memoization plus call/miss counters; hits are calls
+    # minus misses. As with st.cache_data, which this replaced, parameters
+    # with a leading underscore (_api_key, _deadline) are left out of the key.
+    def decorate(func):
+        name = func.__name__
+        signature = inspect.signature(func)
+        cache = _caches[name] = memo.BoundedCache(ttl, max_entries, max_bytes)
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            metrics.incr("tmdb_calls_total", function=name)
+            bound = signature.bind(*args, **kwargs)
+            key = json.dumps(
+                [value for param, value in bound.arguments.items() if not param.startswith("_")],
+                sort_keys=True,
+                default=str,
+            )
+            hit, value = cache.get(key)
+            if hit:
+                return value
+            metrics.incr("tmdb_cache_misses_total", function=name)
+            value = func(*args, **kwargs)
+            cache.put(key, value)
+            return value
+
+        call.clear = cache.clear
+        return call
+
+    return decorate
+
+
+@_counted_cache(ttl=3600, max_entries=8, max_bytes=256 * 1024)
+def get_genre_map(_api_key, language, _deadline=None):
+    # A cold process answers from the shipped snapshot and revalidates it in
+    # the background; the refreshed map is picked up when this entry expires.
     url = f"{BASE_URL}/genre/movie/list"
-    data = _get(url, {"api_key": api_key, "language": language})
+    data = _get_cached(
+        "genres",
+        [language],
+        url,
+        {"api_key": _api_key, "language": language},
+        _deadline,
+        fallback=genre_snapshot().get(language),
+    )
     name_to_id = {genre["name"]: genre["id"] for genre in data.get("genres", [])}
     id_to_name = {genre["id"]: genre["name"] for genre in data.get("genres", [])}
     return {"name_to_id": name_to_id, "id_to_name": id_to_name}
 
 
-@st.cache_data(show_spinner=False, ttl=1800)
-def discover_movies(api_key, language, params):
+def discover_movies(api_key, language, params, deadline=None):
+    # Answer from the local catalog when one has been ingested; live TMDB is
+    # only the fallback.
+    results = catalog.query(language, params)
+    if results is not None:
+        return results
+    return discover_movies_live(api_key, language, params, _deadline=deadline)
+
+
+@_counted_cache(ttl=1800, max_entries=512, max_bytes=8 * 1024 * 1024)
+def discover_movies_live(_api_key, language, params, _deadline=None):
     url = f"{BASE_URL}/discover/movie"
     payload = {
-        "api_key": api_key,
+        "api_key": _api_key,
         "language": language,
         "include_adult": False,
         "sort_by": "popularity.desc",
         "vote_count.gte": 200,
     }
     payload.update(params)
-    data = _get(url, payload)
+    data = _get_cached("discover", [language, params], url, payload, _deadline)
     return data.get("results", [])
 
 
-@st.cache_data(show_spinner=False, ttl=1800)
-def get_movie_details(api_key, movie_id, language):
+@_counted_cache(ttl=1800, max_entries=5000, max_bytes=16 * 1024 * 1024)
+def get_movie_details(
+    _api_key, movie_id, language, _deadline=None, _hedge=False, _on_send=None
+):
+    # Videos ride along in the same round trip so the record carries everything
+    # the cards need to render. A hedge must not join the request it is
+    # hedging, so it skips coalescing.
     url = f"{BASE_URL}/movie/{movie_id}"
-    data = _get(url, {"api_key": api_key, "language": language})
-    return {
-        "id": data["id"],
-        "title": data["title"],
-        "release_date": data.get("release_date", ""),
-        "runtime": data.get("runtime"),
-        "overview": data.get("overview", ""),
-        "poster_path": data.get("poster_path"),
-        "genres": [genre["name"] for genre in data.get("genres", [])],
-        "genre_ids": [genre["id"] for genre in data.get("genres", [])],
-        "vote_average": data.get("vote_average", 0),
-        "vote_count": data.get("vote_count", 0),
-        "popularity": data.get("popularity", 0),
-    }
+    data = _get_cached(
+        "details",
+        [movie_id, language, "videos"],
+        url,
+        {"api_key": _api_key, "language": language, "append_to_response": "videos"},
+        _deadline,
+        coalesce=not _hedge,
+        on_send=_on_send,
+    )
+    return records.Movie(
+        id=data["id"],
+        title=data["title"],
+        release_date=data.get("release_date", ""),
+        runtime=data.get("runtime"),
+        overview=data.get("overview", ""),
+        poster_path=data.get("poster_path"),
+        trailer_url=_pick_trailer_url(data.get("videos", {}).get("results", [])),
+        genres=[genre["name"] for genre in data.get("genres", [])],
+        genre_ids=[genre["id"] for genre in data.get("genres", [])],
+        vote_average=data.get("vote_average", 0),
+        vote_count=data.get("vote_count", 0),
+        popularity=data.get("popularity", 0),
+    )
 
 
-@st.cache_data(show_spinner=False, ttl=1800)
-def get_movie_videos(api_key, movie_id, language):
-    url = f"{BASE_URL}/movie/{movie_id}/videos"
-    data = _get(url, {"api_key": api_key, "language": language})
-    return data.get("results", [])
+def iter_discover_pages(
+    api_key,
+    language,
+    params,
+    max_pages=MAX_DISCOVER_PAGES,
+    prefetch=0,
+    deadline=None,
+    need_more=None,
+):
+    # Pages are fetched on demand; up to `prefetch` later pages are requested
+    # in the background while the caller works on the current one. With
+    # need_more(results), the next page is requested early only when it
+    # returns True for the page about to be yielded, i.e. when that page
+    # will not be enough. A failure on page 1 propagates, later failures (or
+    # running out of time) just end the stream.
+    def fetch(page):
+        return discover_movies(api_key, language, {**params, "page": page}, deadline)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, prefetch))
+    pending = deque()
+    next_page = 1
+    try:
+        while True:
+            while next_page <= max_pages and len(pending) <= prefetch:
+                pending.append((next_page, executor.submit(fetch, next_page)))
+                next_page += 1
+            if not pending:
+                return
+            page, future = pending.popleft()
+            try:
+                results = future.result(timeout=None if deadline is None else deadline.remaining())
+            except (RuntimeError, FutureTimeoutError) as exc:
+                if page == 1:
+                    raise RuntimeError(f"TMDB discover failed: {exc!r}") from exc
+                return
+            if not results:
+                return
+            if need_more is not None and not pending and next_page <= max_pages:
+                if need_more(results):
+                    pending.append((next_page, executor.submit(fetch, next_page)))
+                    next_page += 1
+            yield results
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_candidates(
+    api_key,
+    language,
+    params,
+    exclude_ids=(),
+    target=60,
+    max_pages=MAX_DISCOVER_PAGES,
+    prefetch=0,
+    max_concurrency=8,
+    deadline=None,
+    hedge=True,
+):
+    # Yields hydrated, unseen movies in discover order and stops pulling pages
+    # as soon as `target` candidates have been produced or the deadline passes.
+    # The next page is fetched during hydration only when the current one
+    # leaves us short of the target. Background callers pass hedge=False.
+    produced = set()
 
+    def short_of_target(results):
+        fresh = {
+            movie["id"]
+            for movie in results
+            if movie["id"] not in produced and movie["id"] not in exclude_ids
+        }
+        return len(produced) + len(fresh) < target
+
+    pages = iter_discover_pages(
+        api_key, language, params, max_pages, prefetch, deadline, short_of_target
+    )
+    for page in pages:
+        wanted = []
+        for movie in page:
+            if movie["id"] in exclude_ids or movie["id"] in produced:
+                continue
+            wanted.append(movie)
+            if len(produced) + len(wanted) >= target:
+                break
+
+        # Catalog rows are already full details records.
+        hydrated = {movie["id"]: movie for movie in wanted if isinstance(movie, records.Movie)}
+        missing = [movie["id"] for movie in wanted if movie["id"] not in hydrated]
+        for details in get_movie_details_many(
+            api_key, missing, language, max_concurrency, deadline=deadline, hedge=hedge
+        ):
+            hydrated[details["id"]] = details
+
+        for movie in wanted:
+            details = hydrated.get(movie["id"])
+            if not details:
+                continue
+            produced.add(details["id"])
+            yield details
+            if len(produced) >= target:
+                return
+        if deadline is not None and deadline.expired():
+            return
+
+
+def get_movie_details_many(
+    api_key, movie_ids, language, max_concurrency=8, deadline=None, hedge=True
+):
+    # Fetches details with at most max_concurrency ids in flight and yields
+    # them as they complete. Each id still goes through the cached
+    # get_movie_details, so warm ids return immediately and only cold ids cost
+    # a round trip. Slow ids are hedged with a duplicate request; ids still
+    # outstanding at the deadline are dropped.
+    queue = deque(dict.fromkeys(movie_ids))
+    if not queue:
+        return
+    hedge_after = _hedge_delay() if hedge else None
+    limiter = tmdb_transport.get_transport().limiter
+    executor = ThreadPoolExecutor(
+        max_workers=min(max_concurrency, len(queue)) + (HEDGE_WORKERS if hedge else 0)
+    )
+    in_flight = {}  # future -> movie_id
+    active = set()
+    # movie_id -> when its first request went out. The hedge clock starts
+    # there, like the p95 it is compared with, so time spent waiting for a
+    # rate-limit token or in the disk cache never triggers a hedge.
+    sent = {}
+    hedged = set()
+
+    def submit(movie_id, hedge=False):
+        def on_send():
+            sent.setdefault(movie_id, time.monotonic())
+
+        future = executor.submit(
+            get_movie_details,
+            api_key,
+            movie_id,
+            language,
+            _deadline=deadline,
+            _hedge=hedge,
+            _on_send=None if hedge_after is None or hedge else on_send,
+        )
+        in_flight[future] = movie_id
 
-def get_trailer_url(api_key, movie_id, language):
     try:
-        videos = get_movie_videos(api_key, movie_id, language)
-    except RuntimeError:
-        return None
+        while queue or in_flight:
+            while queue and len(active) < max_concurrency:
+                movie_id = queue.popleft()
+                active.add(movie_id)
+                submit(movie_id)
+
+            timeout = None
+            if hedge_after is not None:
+                now = time.monotonic()
+                # Ids not sent yet are polled at the shortest hedge delay.
+                waits = [
+                    sent[movie_id] + hedge_after - now if movie_id in sent else HEDGE_MIN_DELAY
+                    for movie_id in active
+                    if movie_id not in hedged
+                ]
+                if waits:
+                    timeout = max(0.0, min(waits))
+            if deadline is not None:
+                if deadline.expired():
+                    metrics.incr("tmdb_deadline_dropped_total", len(active) + len(queue))
+                    return
+                remaining = deadline.remaining()
+                timeout = remaining if timeout is None else min(timeout, remaining)
+
+            done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                movie_id = in_flight.pop(future)
+                if movie_id not in active:
+                    continue  # the other request for this id already answered
+                try:
+                    details = future.result()
+                except RuntimeError:
+                    if movie_id in in_flight.values():
+                        continue  # its hedge may still succeed
+                    details = None
+                active.discard(movie_id)
+                if details:
+                    yield details
+
+            # A hedge costs a token too; while the limiter is making callers
+            # wait it would only add to the backlog.
+            if hedge_after is not None and not limiter.limited():
+                now = time.monotonic()
+                for movie_id in list(active):
+                    started = sent.get(movie_id)
+                    if started is None or movie_id in hedged:
+                        continue
+                    if now - started >= hedge_after:
+                        hedged.add(movie_id)
+                        metrics.incr("tmdb_hedged_requests_total")
+                        submit(movie_id, hedge=True)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
+
+def _hedge_delay():
+    latency = tmdb_transport.get_transport().latency_percentile(
+        HEDGE_PERCENTILE, default=HEDGE_DEFAULT_DELAY
+    )
+    return max(HEDGE_MIN_DELAY, latency)
+
+
+def _pick_trailer_url(videos):
     youtube_trailers = [
         video
         for video in videos
@@ -86,7 +412,45 @@ def get_trailer_url(api_key, movie_id, language):
     return f"https://www.youtube.com/watch?v={key}"
 
 
-def get_poster_url(poster_path):
-    if not poster_path:
-        return None
-    return f"{IMAGE_BASE}{poster_path}"
+def genre_snapshot():
+    global _genre_snapshot
+    if _genre_snapshot is None:
+        try:
+            data = json.loads(GENRE_SNAPSHOT_FILE.read_text(encoding="utf-8"))
+            _genre_snapshot = data.get("languages", {})
+        except (OSError, json.JSONDecodeError):
+            _genre_snapshot = {}
+    return _genre_snapshot
+
+
+def save_genre_snapshot(api_key, languages=SNAPSHOT_LANGUAGES):
+    # Refreshes assets/genre_maps.json from live TMDB.
+    global _genre_snapshot
+    payloads = {
+        language: _get(f"{BASE_URL}/genre/movie/list", {"api_key": api_key, "language": language})
+        for language in languages
+    }
+    snapshot = {"saved": time.strftime("%Y-%m-%d"), "languages": payloads}
+    tmp = GENRE_SNAPSHOT_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(snapshot, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+    os.replace(tmp, GENRE_SNAPSHOT_FILE)
+    _genre_snapshot = payloads
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TMDB client maintenance.")
+    parser.add_argument("command", choices=["snapshot-genres"])
+    parser.add_argument("--language", action="append", default=None)
+    args = parser.parse_args()
+
+    api_key = os.environ.get("TMDB_API_KEY")
+    if not api_key:
+        parser.error("TMDB_API_KEY must be set")
+    snapshot = save_genre_snapshot(api_key, args.language or SNAPSHOT_LANGUAGES)
+    for language, payload in snapshot["languages"].items():
+        print(f"{language}: {len(payload.get('genres', []))} genres")
+
+
+if __name__ == "__main__":
+    main()
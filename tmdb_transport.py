@@ -0,0 +1,193 @@
+import email.utils
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# TMDB allows roughly 50 requests/second per IP; stay a little under it.
+RATE_PER_SECOND = 40
+BURST = 40
+POOL_SIZE = 32
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 4.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+LATENCY_SAMPLES = 256
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited_seconds = 0.0
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.acquired += 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        # Drain the bucket so every caller backs off after a 429. The pause is
+        # a floor, not a debt: overlapping 429s wait for the longest one, not
+        # for their sum.
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def limited(self):
+        # True while an acquire would have to wait for a token.
+        with self._lock:
+            tokens = self._tokens + (time.monotonic() - self._updated) * self.rate
+            return tokens < 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate_per_second": self.rate,
+                "capacity": self.capacity,
+                "tokens": round(self._tokens, 2),
+                "acquired": self.acquired,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+
+class Transport:
+    def __init__(self, rate=RATE_PER_SECOND, burst=BURST, pool_size=POOL_SIZE):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.limiter = TokenBucket(rate, burst)
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "retries": 0, "throttled": 0, "failures": 0}
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def get(self, url, params, timeout=10, deadline=None, on_send=None):
+        # With a deadline, each attempt's timeout shrinks to the time left and
+        # no retry is attempted that could not finish in time. on_send is
+        # called as each attempt goes out, after any wait for a token.
+        for attempt in range(MAX_RETRIES + 1):
+            self.limiter.acquire()
+            self._count("requests")
+            if on_send is not None:
+                on_send()
+            started = time.monotonic()
+            try:
+                response = self.session.get(
+                    url,
+                    params=params,
+                    timeout=timeout if deadline is None else deadline.timeout(timeout),
+                )
+            except requests.RequestException as exc:
+                if attempt == MAX_RETRIES or _out_of_time(deadline, 0):
+                    self._count("failures")
+                    raise RuntimeError(f"TMDB request failed: {exc}") from exc
+                self._count("retries")
+                time.sleep(_backoff(attempt))
+                continue
+
+            if response.status_code == 200:
+                with self._lock:
+                    self._latencies.append(time.monotonic() - started)
+                return response.json()
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                self._count("failures")
+                raise RuntimeError(f"TMDB request failed: {response.status_code}")
+
+            self._count("retries")
+            delay = _backoff(attempt)
+            if response.status_code == 429:
+                self._count("throttled")
+                retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                self.limiter.pause(delay)
+            if _out_of_time(deadline, delay):
+                self._count("failures")
+                raise RuntimeError("TMDB request failed: deadline exceeded")
+            time.sleep(delay)
+
+    def latency_percentile(self, pct, default=None):
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < 20:
+            return default
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        pools = self.session.get_adapter("https://").poolmanager.pools
+        counts["pool_size"] = self.pool_size
+        counts["open_pools"] = len(pools)
+        counts["limiter"] = self.limiter.stats()
+        for pct in (50, 95):
+            latency = self.latency_percentile(pct)
+            counts[f"latency_p{pct}_ms"] = None if latency is None else round(latency * 1000)
+        return counts
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+
+def _out_of_time(deadline, delay):
+    return deadline is not None and deadline.remaining() <= delay
+
+
+def _backoff(attempt):
+    delay = min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    # One transport per process so pooled connections and the rate budget are
+    # shared by every Streamlit session.
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = Transport()
+    return _transport
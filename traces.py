@@ -0,0 +1,85 @@
+import json
+import os
+import pathlib
+import re
+import threading
+import time
+import uuid
+
+import recommender
+
+
+# Opt-in session traces for benchmarks/bench_load.py. A trace holds what a
+# session asked for and did, never who it was: a random session id, offsets
+# from the session's first action, scrubbed mood text, and feedback as the
+# card position rather than the movie.
+TRACE_FILE = pathlib.Path(os.environ.get("TRACE_FILE", "data/traces.jsonl"))
+MAX_MOOD_CHARS = 200
+ACTIONS = ("pick", "refresh", "feedback")
+
+_lock = threading.Lock()
+_EMAIL = re.compile(r"\S+@\S+")
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_DIGITS = re.compile(r"\d{3,}")
+_CHIP_TEXTS = set(recommender.MOOD_CHIP_TEXT.values())
+
+
+class SessionTrace:
+    # One per Streamlit session; lives in st.session_state.
+    def __init__(self, path=None):
+        self.session_id = uuid.uuid4().hex[:16]
+        self.path = pathlib.Path(path) if path else TRACE_FILE
+        self.started = None
+
+    def record(self, action, inputs=None, **fields):
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+        event = {"session": self.session_id, "t": round(now - self.started, 1), "action": action}
+        if inputs is not None:
+            event["inputs"] = anonymize_inputs(inputs)
+        event.update(fields)
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+        with _lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("ab") as handle:
+                handle.write(line)
+
+
+def anonymize_inputs(inputs):
+    return {
+        "mood_text": scrub(inputs.get("mood_text")),
+        "time_available": int(inputs.get("time_available") or 120),
+        "energy": inputs.get("energy") or "Okay",
+        "language": inputs.get("language") or "en-US",
+        "tighten_runtime": bool(inputs.get("tighten_runtime", False)),
+    }
+
+
+def scrub(mood_text):
+    # Chip sentences are kept as they are; free text loses addresses, links
+    # and long numbers, and is cut to MAX_MOOD_CHARS.
+    text = " ".join((mood_text or "").split())
+    if text in _CHIP_TEXTS:
+        return text
+    text = _EMAIL.sub("<email>", text)
+    text = _URL.sub("<url>", text)
+    text = _DIGITS.sub("<number>", text)
+    return text[:MAX_MOOD_CHARS]
+
+
+def load(path=None):
+    # Returns sessions as lists of events in recorded order. `path` may be one
+    # JSONL file or a directory of them; unreadable lines are skipped.
+    path = pathlib.Path(path) if path else TRACE_FILE
+    files = sorted(path.glob("*.jsonl")) if path.is_dir() else [path]
+    sessions = {}
+    for file in files:
+        for line in file.read_text(encoding="utf-8").splitlines():
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if event.get("action") in ACTIONS:
+                sessions.setdefault(event.get("session"), []).append(event)
+    return [sorted(events, key=lambda event: event["t"]) for events in sessions.values()]
@@ -0,0 +1,153 @@
+import argparse
+import itertools
+import os
+import threading
+import time
+
+import disk_cache
+import openai_picker
+import penalty_index
+import pipeline
+import records
+import recommender
+
+
+ENERGIES = ["Dead", "Okay", "Ready"]
+LANGUAGES = ["en-US", "ko-KR"]
+TIME_VALUES = [90, 120, 150]
+# Warm pools are larger than a live request so they survive seen-id filtering
+# for several rounds.
+POOL_TARGET = 60
+INTERVAL_SECONDS = 30 * 60
+
+
+def combinations():
+    for mood_text, energy, language, time_available in itertools.product(
+        recommender.MOOD_CHIP_TEXT.values(), ENERGIES, LANGUAGES, TIME_VALUES
+    ):
+        yield {
+            "mood_text": mood_text,
+            "time_available": time_available,
+            "energy": energy,
+            "language": language,
+            "tighten_runtime": False,
+        }
+
+
+def warm_one(tmdb_api_key, openai_api_key, inputs):
+    candidates = pipeline.gather_candidates(
+        tmdb_api_key, inputs, target=POOL_TARGET, hedge=False
+    )
+    if len(candidates) < 3:
+        return False
+    user_state = pipeline.user_state_from(inputs)
+    # Same feedback penalties as the live path; feedback saved after this
+    # run is picked up by the next one.
+    penalties = penalty_index.get_penalties(user_state)
+    picks, reasons, _ = openai_picker.pick_movies(
+        candidates, user_state, openai_api_key, penalties=penalties
+    )
+    disk_cache.store(
+        "warm",
+        _key(inputs),
+        {
+            "candidates": [
+                movie.to_dict()
+                for movie in recommender.score_candidates(
+                    candidates, user_state, penalties=penalties
+                )
+            ],
+            # JSON keys are strings, so keep reasons as ordered pairs.
+            "picks": [[movie["id"], reasons.get(movie["id"], "")] for movie in picks],
+        },
+    )
+    return True
+
+
+def warm_all(tmdb_api_key, openai_api_key):
+    warmed = 0
+    for inputs in combinations():
+        try:
+            warmed += warm_one(tmdb_api_key, openai_api_key, inputs)
+        except RuntimeError:
+            continue
+    return warmed
+
+
+def lookup_picks(inputs, seen_ids, penalties=None):
+    # Serve a precomputed pool for chip moods. Returns
+    # (picks, reasons, highlight_id, candidate_count) or None to use the live
+    # path.
+    if inputs["mood_text"] not in recommender.MOOD_CHIP_TEXT.values():
+        return None
+    entry = disk_cache.lookup("warm", _key(inputs))
+    if entry is None:
+        return None
+
+    pool = [
+        records.Movie.from_dict(movie)
+        for movie in entry["candidates"]
+        if movie["id"] not in seen_ids
+    ]
+    if len(pool) < 3:
+        return None
+
+    by_id = {movie["id"]: movie for movie in pool}
+    if all(movie_id in by_id for movie_id, _ in entry["picks"]):
+        picks = [by_id[movie_id] for movie_id, _ in entry["picks"]]
+        reasons = {movie_id: reason for movie_id, reason in entry["picks"]}
+        return picks, reasons, picks[0]["id"], len(pool)
+
+    # Some precomputed picks were already seen; re-pick locally from the rest.
+    user_state = pipeline.user_state_from(inputs)
+    picks = recommender.pick_top_three(pool, user_state, penalties=penalties)
+    reasons = recommender.template_reasons(picks, user_state)
+    return picks, reasons, picks[0]["id"], len(pool)
+
+
+def _key(inputs):
+    return [
+        inputs["mood_text"],
+        inputs["energy"],
+        inputs["language"],
+        inputs["time_available"],
+        bool(inputs["tighten_runtime"]),
+    ]
+
+
+def run_forever(tmdb_api_key, openai_api_key, interval=INTERVAL_SECONDS):
+    while True:
+        started = time.monotonic()
+        warm_all(tmdb_api_key, openai_api_key)
+        time.sleep(max(0, interval - (time.monotonic() - started)))
+
+
+def start_background(tmdb_api_key, openai_api_key, interval=INTERVAL_SECONDS):
+    thread = threading.Thread(
+        target=run_forever,
+        args=(tmdb_api_key, openai_api_key, interval),
+        name="pick-warmer",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute picks for the mood chips.")
+    parser.add_argument("--loop", action="store_true", help="keep warming every --interval")
+    parser.add_argument("--interval", type=int, default=INTERVAL_SECONDS)
+    args = parser.parse_args()
+
+    tmdb_api_key = os.environ.get("TMDB_API_KEY")
+    if not tmdb_api_key:
+        parser.error("TMDB_API_KEY must be set")
+    openai_api_key = os.environ.get("OPENAI_API_KEY")
+    if args.loop:
+        run_forever(tmdb_api_key, openai_api_key, args.interval)
+    else:
+        print(f"warmed {warm_all(tmdb_api_key, openai_api_key)} combinations")
+
+
+if __name__ == "__main__":
+    main()